@@ -1,13 +1,76 @@
 from __future__ import annotations
-from typing import Optional
+from typing import Iterable, Optional
 from models.letterboxd import LetterboxdMovie
-from pydantic.dataclasses import dataclass
-from shared_items.interfaces import Prop as NotionProp
+from notion_schema import (
+    PropertySchema,
+    encode_external_file,
+    encode_number,
+    encode_rich_text,
+    encode_title,
+    encode_url,
+)
 from shared_items.utils import convert_runtime
 
 
-@dataclass
+# position of the letterboxd id in NotionMovieItem.column_values
+LETTERBOXD_ID_COLUMN = 4
+
+
+# same column order as NotionMovieItem.column_values
+MOVIE_SCHEMA = PropertySchema(
+    [
+        ("Title", encode_title),
+        ("Year", encode_number),
+        ("Runtime", encode_rich_text),
+        ("Location", encode_rich_text),
+        ("Letterboxd ID", encode_rich_text),
+        ("Letterboxd Link", encode_url),
+        ("Poster", encode_external_file),
+    ]
+)
+
+
+def movie_fingerprint(column_values: Iterable) -> tuple[int, ...]:
+    # one hash per column, so a diff can tell which columns changed without
+    # holding on to every existing row's strings
+    return tuple(hash(value) for value in column_values)
+
+
+def notion_row_column_values(notion_row: dict) -> tuple:
+    # same order as NotionMovieItem.column_values
+    properties = notion_row["properties"]
+    return (
+        properties["Title"]["title"][0]["plain_text"],
+        properties["Year"]["number"],
+        properties["Runtime"]["rich_text"][0]["plain_text"],
+        properties["Location"]["rich_text"][0]["plain_text"],
+        properties["Letterboxd ID"]["rich_text"][0]["plain_text"],
+        properties["Letterboxd Link"]["url"],
+        (
+            properties["Poster"]["files"][0]["external"]["url"]
+            if properties["Poster"]["files"]
+            else None
+        ),
+    )
+
+
 class NotionMovieItem:
+    # Slotted and immutable, with the content fingerprint worked out once at
+    # construction, so hashing and comparing tens of thousands of items in a
+    # diff never rebuilds anything. notion_id isn't part of the content.
+    __slots__ = (
+        "title",
+        "runtime",
+        "location",
+        "year",
+        "letterboxd_id",
+        "letterboxd_link",
+        "poster_url",
+        "notion_id",
+        "_fingerprint",
+        "_hash",
+    )
+
     title: str
     runtime: str
     location: str
@@ -15,100 +78,94 @@ class NotionMovieItem:
     letterboxd_id: str
     letterboxd_link: str
     poster_url: str
-    notion_id: Optional[str] = None
+    notion_id: Optional[str]
+    _fingerprint: tuple[int, ...]
+    _hash: int
+
+    def __init__(
+        self,
+        title: str,
+        runtime: str,
+        location: str,
+        year: int,
+        letterboxd_id: str,
+        letterboxd_link: str,
+        poster_url: str,
+        notion_id: Optional[str] = None,
+    ) -> None:
+        assign = super().__setattr__
+        assign("title", title)
+        assign("runtime", runtime)
+        assign("location", location)
+        assign("year", year)
+        assign("letterboxd_id", letterboxd_id)
+        assign("letterboxd_link", letterboxd_link)
+        assign("poster_url", poster_url)
+        assign("notion_id", notion_id)
+        assign("_fingerprint", movie_fingerprint(self.column_values()))
+        assign("_hash", hash(self._fingerprint))
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"NotionMovieItem is immutable; can't set {name}")
 
     def __eq__(self, other) -> bool:
         if isinstance(other, NotionMovieItem):
-            return self.__hash__() == other.__hash__()
+            return self._fingerprint == other._fingerprint
         else:
             return False
 
-    def __hash__(self):
-        dicted = {**self.__dict__}
-        dicted.pop("notion_id", None)
-        return hash(tuple(sorted(dicted.items())))
-
-    @classmethod
-    def from_notion_interface(self, notion_row: dict) -> NotionMovieItem:
-        notion_id = notion_row["id"]
-        properties = notion_row["properties"]
-
-        title = properties["Title"]["title"][0]["plain_text"]
-        runtime = properties["Runtime"]["rich_text"][0]["plain_text"]
-        location = properties["Location"]["rich_text"][0]["plain_text"]
-        letterboxd_id = properties["Letterboxd ID"]["rich_text"][0]["plain_text"]
-        letterboxd_link = properties["Letterboxd Link"]["url"]
-        year = properties["Year"]["number"]
-        poster_url = (
-            properties["Poster"]["files"][0]["external"]["url"]
-            if properties["Poster"]["files"]
-            else None
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return (
+            f"NotionMovieItem(letterboxd_id={self.letterboxd_id!r}, "
+            f"title={self.title!r}, notion_id={self.notion_id!r})"
         )
 
-        return NotionMovieItem(
-            title=title,
-            runtime=runtime,
-            location=location,
-            letterboxd_id=letterboxd_id,
-            letterboxd_link=letterboxd_link,
-            year=year,
-            poster_url=poster_url,
-            notion_id=notion_id,
+    def column_values(self) -> tuple:
+        # same order as MOVIE_SCHEMA's columns
+        return (
+            self.title,
+            self.year,
+            self.runtime,
+            self.location,
+            self.letterboxd_id,
+            self.letterboxd_link,
+            self.poster_url,
         )
 
-    def format_for_notion_interface(self) -> list[NotionProp]:
+    def as_dict(self) -> dict:
+        return {
+            "title": self.title,
+            "runtime": self.runtime,
+            "location": self.location,
+            "year": self.year,
+            "letterboxd_id": self.letterboxd_id,
+            "letterboxd_link": self.letterboxd_link,
+            "poster_url": self.poster_url,
+        }
+
+    def fingerprint(self) -> tuple[int, ...]:
+        return self._fingerprint
+
+    def changed_columns(self, existing_fingerprint: tuple[int, ...]) -> list[int]:
         return [
-            {
-                "name": "Title",
-                "type": "title",
-                "content": {
-                    "content": self.title,
-                },
-            },
-            {
-                "name": "Year",
-                "type": "number",
-                "content": {
-                    "content": self.year,
-                },
-            },
-            {
-                "name": "Runtime",
-                "type": "rich_text",
-                "content": {
-                    "content": self.runtime,
-                },
-            },
-            {
-                "name": "Location",
-                "type": "rich_text",
-                "content": {
-                    "content": self.location,
-                },
-            },
-            {
-                "name": "Letterboxd ID",
-                "type": "rich_text",
-                "content": {
-                    "content": self.letterboxd_id,
-                },
-            },
-            {
-                "name": "Letterboxd Link",
-                "type": "url",
-                "content": {
-                    "content": self.letterboxd_link,
-                },
-            },
-            {
-                "name": "Poster",
-                "type": "files",
-                "content": {
-                    "url": self.poster_url,
-                },
-            },
+            index
+            for index, (fresh, existing) in enumerate(
+                zip(self._fingerprint, existing_fingerprint)
+            )
+            if fresh != existing
         ]
 
+    def notion_properties(self) -> dict:
+        return MOVIE_SCHEMA.encode(self.column_values())
+
+    def changed_notion_properties(self, existing_fingerprint: tuple[int, ...]) -> dict:
+        return MOVIE_SCHEMA.encode_columns(
+            self.column_values(), self.changed_columns(existing_fingerprint)
+        )
+
 
 class Assembler:
     def __init__(self, movie: LetterboxdMovie) -> None:
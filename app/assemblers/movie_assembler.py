@@ -1,5 +1,5 @@
 from typing import Optional
-from models.models import Movie
+from models.models import MovieSummary
 from pydantic.dataclasses import dataclass
 from shared_items.interfaces import Prop as NotionProp
 from shared_items.utils import pp, convert_runtime
@@ -58,7 +58,7 @@ class NotionMovieItem:
 
 
 class MovieAssembler:
-    def __init__(self, movie: Movie) -> None:
+    def __init__(self, movie: MovieSummary) -> None:
         self.movie = movie
 
     def format_runtime(self) -> str:
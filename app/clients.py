@@ -0,0 +1,24 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from justwatch import JustWatch
+    from shared_items.interfaces import Notion
+
+JUST_WATCH_COUNTRY = "US"
+
+
+# One client of each per process, built on first use: importing a module
+# never opens a client, so tests and --help don't pay for ones they never use.
+@lru_cache(maxsize=None)
+def get_notion() -> "Notion":
+    from shared_items.interfaces import Notion
+
+    return Notion()
+
+
+@lru_cache(maxsize=None)
+def get_just_watch() -> "JustWatch":
+    from justwatch import JustWatch
+
+    return JustWatch(country=JUST_WATCH_COUNTRY)
@@ -1,4 +1,6 @@
+from functools import lru_cache
 from typing import TypedDict
+import json
 
 
 class PartialProvider(TypedDict):
@@ -33,3 +35,37 @@ RELEVANT_STREAMING_SERVICES: list[PartialProvider] = [
     {"clear_name": "Tubi TV", "short_name": "tbv"},
     {"clear_name": "Kanopy", "short_name": "knp"},
 ]
+
+# looked up once per watch option, so these are sets rather than list scans
+RELEVANT_STREAMING_NAMES: frozenset[str] = frozenset(
+    service["clear_name"] for service in RELEVANT_STREAMING_SERVICES
+)
+RELEVANT_STREAMING_SHORT_NAMES: frozenset[str] = frozenset(
+    service["short_name"] for service in RELEVANT_STREAMING_SERVICES
+)
+
+# an optional JSON list of clear names, the service you'd rather watch on first
+STREAMING_PRIORITY_PATH = "data/streaming_priority.json"
+
+
+def rank_streaming_services(ranked_names: list[str]) -> dict[str, int]:
+    unknown = sorted(set(ranked_names) - RELEVANT_STREAMING_NAMES)
+    if unknown:
+        raise ValueError(f"unknown streaming services: {', '.join(unknown)}")
+
+    ranks: dict[str, int] = {}
+    for name in ranked_names:
+        ranks.setdefault(name, len(ranks))
+    # unranked services tie behind the ranked ones, so among them the
+    # cheapest option still wins
+    return {name: ranks.get(name, len(ranks)) for name in RELEVANT_STREAMING_NAMES}
+
+
+@lru_cache(maxsize=None)
+def streaming_priority(path: str = STREAMING_PRIORITY_PATH) -> dict[str, int]:
+    try:
+        with open(path, "r") as f:
+            ranked_names = json.load(f)
+    except FileNotFoundError:
+        ranked_names = []
+    return rank_streaming_services(ranked_names)
@@ -0,0 +1,479 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
+from html.parser import HTMLParser
+from importlib.util import find_spec
+from typing import Any, NamedTuple, Optional, Union, cast
+import asyncio
+import os
+
+from utils import Fetcher, FetchResult, read_bytes
+
+# lxml is optional; the streaming backend needs only the stdlib. Like bs4,
+# it's imported by the first parse that uses it rather than here.
+LXML_AVAILABLE = find_spec("lxml") is not None
+
+Markup = Union[str, bytes]
+
+LETTERBOXD_MOVIE_DATA_ATTRS = [
+    "data-film-id",
+    "data-film-name",
+    "data-film-release-year",
+    "data-film-link",
+]
+
+
+class ListPage(NamedTuple):
+    items: list[dict]
+    page_count: int
+
+
+class FilmPageData(NamedTuple):
+    runtime: str
+    genres: list[str]
+
+
+def data_attrs(attrs: dict) -> dict:
+    return {key: value for key, value in attrs.items() if key.startswith("data-")}
+
+
+def list_item(attrs: dict, alt: Optional[str]) -> dict:
+    # the poster image's alt text is the film's name, which lets the scraper
+    # skip the poster ajax fragment when the div doesn't carry data-film-name
+    item = data_attrs(attrs)
+    if alt and "data-film-name" not in item:
+        item["data-film-name"] = alt
+    return item
+
+
+def poster_attrs(attrs: dict, srcset: Optional[str]) -> Optional[dict]:
+    if any(key not in attrs for key in LETTERBOXD_MOVIE_DATA_ATTRS):
+        return None
+    relevant_attrs = {key: attrs[key] for key in LETTERBOXD_MOVIE_DATA_ATTRS}
+    if srcset:
+        relevant_attrs["poster_url"] = srcset.replace(" 2x", "")
+    return relevant_attrs
+
+
+def runtime_from_strings(strings: list[str]) -> str:
+    runtime = strings[0].split("\xa0")[0] if strings else ""
+    return runtime if runtime.isdigit() else ""
+
+
+def page_count_from_labels(labels: list[str]) -> int:
+    # the paginator lists the first and last few page numbers, so the
+    # largest one is the total even when the middle is elided
+    return max((int(label) for label in labels if label.isdigit()), default=1)
+
+
+def has_class(class_attr: Optional[str], name: str) -> bool:
+    return name in (class_attr or "").split()
+
+
+# The reference backend: what the scraper has always used. bs4 is imported
+# on first use, since the default backends don't need it.
+class SoupExtractor:
+    def list_page(self, html: Markup) -> ListPage:
+        from bs4 import BeautifulSoup, Tag
+
+        soup = BeautifulSoup(html, "html.parser")
+        items = []
+        for item in soup.find_all("div", {"class": "really-lazy-load"}):
+            img = item.find("img")
+            alt = img.get("alt") if isinstance(img, Tag) else None
+            items.append(list_item(item.attrs, cast(Optional[str], alt)))
+        labels = [
+            page.get_text(strip=True)
+            for page in soup.select("div.paginate-pages li.paginate-page")
+        ]
+        return ListPage(items, page_count_from_labels(labels))
+
+    def poster(self, html: Markup) -> Optional[dict]:
+        from bs4 import BeautifulSoup, Tag
+
+        soup = BeautifulSoup(html, "html.parser")
+        poster = soup.find("div", {"class": "poster"})
+        if not isinstance(poster, Tag):
+            return None
+        img = poster.find("img")
+        srcset = img.get("srcset") if isinstance(img, Tag) else None
+        return poster_attrs(poster.attrs, cast(Optional[str], srcset))
+
+    def film_page(self, html: Markup) -> FilmPageData:
+        from bs4 import BeautifulSoup, Tag
+
+        soup = BeautifulSoup(html, "html.parser")
+
+        runtime = ""
+        runtime_el = soup.find("p", {"class": "text-link"})
+        if isinstance(runtime_el, Tag):
+            runtime = runtime_from_strings(list(runtime_el.stripped_strings))
+
+        genres: list[str] = []
+        genres_parent_el = soup.find("div", {"id": "tab-genres"})
+        if isinstance(genres_parent_el, Tag):
+            genre_el = genres_parent_el.find("div")
+            if isinstance(genre_el, Tag):
+                genres = list(genre_el.stripped_strings)
+
+        return FilmPageData(runtime=runtime, genres=genres)
+
+
+def xpath_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def lxml_stripped_strings(element: Any) -> list[str]:
+    return [text.strip() for text in element.itertext() if text.strip()]
+
+
+@lru_cache(maxsize=None)
+def lxml_utf8_parser() -> Any:
+    import lxml.html
+
+    return lxml.html.HTMLParser(encoding="utf-8")
+
+
+def lxml_document(html: Markup) -> Any:
+    import lxml.html
+
+    try:
+        # Letterboxd serves UTF-8, but the poster fragments carry no meta
+        # charset and libxml2 would otherwise read their bytes as Latin-1
+        if isinstance(html, bytes):
+            return lxml.html.fromstring(html, parser=lxml_utf8_parser())
+        return lxml.html.fromstring(html)
+    except lxml.etree.ParserError:
+        # lxml refuses an empty document; to soup it's a page with nothing on it
+        return lxml.html.fromstring("<html></html>")
+
+
+class LxmlExtractor:
+    def list_page(self, html: Markup) -> ListPage:
+        document = lxml_document(html)
+        items = []
+        for item in document.xpath(f"//div[{xpath_class('really-lazy-load')}]"):
+            images = item.xpath(".//img")
+            alt = images[0].get("alt") if images else None
+            items.append(list_item(dict(item.attrib), alt))
+        labels = [
+            "".join(lxml_stripped_strings(page))
+            for page in document.xpath(
+                f"//div[{xpath_class('paginate-pages')}]//li[{xpath_class('paginate-page')}]"
+            )
+        ]
+        return ListPage(items, page_count_from_labels(labels))
+
+    def poster(self, html: Markup) -> Optional[dict]:
+        posters = lxml_document(html).xpath(f"//div[{xpath_class('poster')}]")
+        if not posters:
+            return None
+        images = posters[0].xpath(".//img")
+        srcset = images[0].get("srcset") if images else None
+        return poster_attrs(dict(posters[0].attrib), srcset)
+
+    def film_page(self, html: Markup) -> FilmPageData:
+        document = lxml_document(html)
+
+        runtime_els = document.xpath(f"//p[{xpath_class('text-link')}]")
+        runtime = (
+            runtime_from_strings(lxml_stripped_strings(runtime_els[0]))
+            if runtime_els
+            else ""
+        )
+
+        genre_els = document.xpath("//div[@id='tab-genres']//div")
+        genres = lxml_stripped_strings(genre_els[0]) if genre_els else []
+
+        return FilmPageData(runtime=runtime, genres=genres)
+
+
+class StopParsing(Exception):
+    pass
+
+
+class TargetedParser(HTMLParser):
+    # subclasses raise StopParsing once they have what they need, so the
+    # rest of a (large) film page is never tokenized
+    def extract(self, html: Markup) -> None:
+        text = (
+            html.decode("utf-8", errors="replace") if isinstance(html, bytes) else html
+        )
+        try:
+            self.feed(text)
+            self.close()
+        except StopParsing:
+            pass
+
+
+class ListPageParser(TargetedParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.items: list[dict] = []
+        self.labels: list[str] = []
+        self.paginator_depth = 0
+        self.label_parts: Optional[list[str]] = None
+        self.item_attrs: Optional[dict] = None
+        self.item_alt: Optional[str] = None
+        self.item_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        attr_dict = {key: value or "" for key, value in attrs}
+        if tag == "div":
+            if self.paginator_depth:
+                self.paginator_depth += 1
+            elif has_class(attr_dict.get("class"), "paginate-pages"):
+                self.paginator_depth = 1
+            if self.item_depth:
+                self.item_depth += 1
+            elif has_class(attr_dict.get("class"), "really-lazy-load"):
+                self.item_attrs = attr_dict
+                self.item_alt = None
+                self.item_depth = 1
+        elif tag == "img" and self.item_depth and self.item_alt is None:
+            self.item_alt = attr_dict.get("alt")
+        elif (
+            tag == "li"
+            and self.paginator_depth
+            and has_class(attr_dict.get("class"), "paginate-page")
+        ):
+            self.label_parts = []
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "div" and self.item_depth:
+            self.item_depth -= 1
+            if not self.item_depth:
+                self.items.append(list_item(cast(dict, self.item_attrs), self.item_alt))
+        if tag == "div" and self.paginator_depth:
+            self.paginator_depth -= 1
+        elif tag == "li" and self.label_parts is not None:
+            self.labels.append("".join(self.label_parts))
+            self.label_parts = None
+
+    def handle_data(self, data: str) -> None:
+        if self.label_parts is not None and data.strip():
+            self.label_parts.append(data.strip())
+
+
+class PosterParser(TargetedParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.attrs: Optional[dict] = None
+        self.srcset: Optional[str] = None
+        self.poster_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        attr_dict = {key: value or "" for key, value in attrs}
+        if tag == "div":
+            if self.poster_depth:
+                self.poster_depth += 1
+            elif self.attrs is None and has_class(attr_dict.get("class"), "poster"):
+                self.attrs = attr_dict
+                self.poster_depth = 1
+        elif tag == "img" and self.poster_depth:
+            self.srcset = attr_dict.get("srcset")
+            raise StopParsing
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "div" and self.poster_depth:
+            self.poster_depth -= 1
+            if not self.poster_depth:
+                raise StopParsing
+
+
+class FilmPageParser(TargetedParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.runtime_strings: Optional[list[str]] = None
+        self.runtime_done = False
+        self.in_genres_tab = False
+        self.genres: Optional[list[str]] = None
+        self.genre_depth = 0
+        self.genres_done = False
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        attr_dict = {key: value or "" for key, value in attrs}
+        if (
+            tag == "p"
+            and not self.runtime_done
+            and self.runtime_strings is None
+            and has_class(attr_dict.get("class"), "text-link")
+        ):
+            self.runtime_strings = []
+        elif tag == "div" and not self.genres_done:
+            if self.genre_depth:
+                self.genre_depth += 1
+            elif self.in_genres_tab:
+                self.genres = []
+                self.genre_depth = 1
+            elif attr_dict.get("id") == "tab-genres":
+                self.in_genres_tab = True
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "p" and self.runtime_strings is not None and not self.runtime_done:
+            self.runtime_done = True
+        elif tag == "div" and self.genre_depth:
+            self.genre_depth -= 1
+            if not self.genre_depth:
+                self.genres_done = True
+        elif tag == "div" and self.in_genres_tab and self.genres is None:
+            # the genres tab closed without an inner div
+            self.in_genres_tab = False
+            self.genres_done = True
+        self.stop_when_done()
+
+    def handle_data(self, data: str) -> None:
+        text = data.strip()
+        if not text:
+            return
+        if self.runtime_strings is not None and not self.runtime_done:
+            self.runtime_strings.append(text)
+            # only the first string matters for the runtime
+            self.runtime_done = True
+        if self.genre_depth and self.genres is not None:
+            self.genres.append(text)
+        self.stop_when_done()
+
+    def stop_when_done(self) -> None:
+        if self.runtime_done and self.genres_done:
+            raise StopParsing
+
+
+class StreamingExtractor:
+    def list_page(self, html: Markup) -> ListPage:
+        parser = ListPageParser()
+        parser.extract(html)
+        return ListPage(parser.items, page_count_from_labels(parser.labels))
+
+    def poster(self, html: Markup) -> Optional[dict]:
+        parser = PosterParser()
+        parser.extract(html)
+        if parser.attrs is None:
+            return None
+        return poster_attrs(parser.attrs, parser.srcset)
+
+    def film_page(self, html: Markup) -> FilmPageData:
+        parser = FilmPageParser()
+        parser.extract(html)
+        return FilmPageData(
+            runtime=runtime_from_strings(parser.runtime_strings or []),
+            genres=parser.genres or [],
+        )
+
+
+EXTRACTORS: dict[str, Any] = {
+    "soup": SoupExtractor(),
+    "stream": StreamingExtractor(),
+}
+if LXML_AVAILABLE:
+    EXTRACTORS["lxml"] = LxmlExtractor()
+
+DEFAULT_BACKEND = "lxml" if LXML_AVAILABLE else "stream"
+
+
+def extract(backend: str, kind: str, html: Markup) -> Any:
+    # module-level so a process pool can pickle it by name
+    return getattr(EXTRACTORS[backend], kind)(html)
+
+
+class ParsePool:
+    def __init__(
+        self, backend: str = DEFAULT_BACKEND, workers: Optional[int] = None
+    ) -> None:
+        if backend not in EXTRACTORS:
+            raise ValueError(f"unknown extractor backend {backend!r}")
+        self.backend = backend
+        self.workers = workers
+        self.executor: Optional[Executor] = None
+
+    @property
+    def concurrency(self) -> int:
+        if self.workers == 0:
+            return 1
+        return self.workers or os.cpu_count() or 1
+
+    def __enter__(self) -> "ParsePool":
+        # workers=0 parses inline, which is handy for tests and tiny runs
+        if self.workers != 0:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.executor:
+            self.executor.shutdown()
+        self.executor = None
+
+    async def run(self, kind: str, html: Markup) -> Any:
+        if self.executor is None:
+            return extract(self.backend, kind, html)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, extract, self.backend, kind, html
+        )
+
+    async def list_page(self, html: Markup) -> ListPage:
+        return await self.run("list_page", html)
+
+    async def poster(self, html: Markup) -> Optional[dict]:
+        return await self.run("poster", html)
+
+    async def film_page(self, html: Markup) -> FilmPageData:
+        return await self.run("film_page", html)
+
+
+class ParseStage:
+    # Downloads and parsing overlap: fetched bodies go onto a bounded queue
+    # that one consumer per pool worker drains into the pool. A download only
+    # starts once there is room for its body, so if parsing falls behind the
+    # downloaders wait instead of piling pages up in memory.
+    def __init__(
+        self, fetcher: Fetcher, parse_pool: ParsePool, max_pending: Optional[int] = None
+    ) -> None:
+        self.fetcher = fetcher
+        self.parse_pool = parse_pool
+        self.consumer_count = parse_pool.concurrency
+        self.max_pending = max_pending or max(
+            fetcher.concurrency, 2 * self.consumer_count
+        )
+
+    async def __aenter__(self) -> "ParseStage":
+        self.queue: asyncio.Queue = asyncio.Queue(self.max_pending)
+        # every body held in memory is either queued or being parsed
+        self.slots = asyncio.Semaphore(self.max_pending + self.consumer_count)
+        self.consumers = [
+            asyncio.create_task(self.consume()) for _ in range(self.consumer_count)
+        ]
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        for consumer in self.consumers:
+            consumer.cancel()
+        await asyncio.gather(*self.consumers, return_exceptions=True)
+
+    async def consume(self) -> None:
+        while True:
+            kind, body, parsed = await self.queue.get()
+            try:
+                content = await self.parse_pool.run(kind, body)
+                # the fetch waiting on it may have been cancelled meanwhile
+                if not parsed.done():
+                    parsed.set_result(content)
+            except Exception as error:
+                if not parsed.done():
+                    parsed.set_exception(error)
+            finally:
+                self.queue.task_done()
+
+    async def fetch(
+        self, url: str, kind: str, resource: Optional[str] = None
+    ) -> FetchResult:
+        async with self.slots:
+            result = await self.fetcher.fetch(url, read_bytes, resource)
+            if not result.ok:
+                return result
+            parsed = asyncio.get_running_loop().create_future()
+            await self.queue.put((kind, result.content, parsed))
+            try:
+                return FetchResult(url, await parsed)
+            except Exception as error:
+                # a body the parser chokes on fails its own url, not the sync
+                return FetchResult(url, error=error)
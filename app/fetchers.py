@@ -1,39 +1,80 @@
-from typing import Optional, TypedDict
-from justwatch import JustWatch
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple, Optional, TypedDict
+import json
 from pydantic import BaseModel
-from shared_items.utils import pp, strip_all_punctuation, measure_execution
-from shared_items.interfaces import Notion, Prop as NotionProp
+from shared_items.utils import pp, strip_all_punctuation
+from shared_items.interfaces import Prop as NotionProp
 from shared_items.interfaces.notion import MOVIES_DATABASE_ID
 
-from models.models import JustWatchSearchResult, Movie, Provider, ProviderCollection
+from clients import get_just_watch, get_notion
+from metrics import metrics
+from models.models import JustWatchSearchResult, ProviderCollection, ProviderIndex
+from notion_query import NotionQuery
+from utils import ThreadRateLimiter
 
-just_watch = JustWatch(country="US")
+JUST_WATCH_WORKERS = 8
+JUST_WATCH_REQUESTS_PER_SECOND = 5.0
 
-notion = Notion()
+MOVIES_2023_PATH = "data/movies_2023.json"
 
 
 class PartialJustWatchResponse(TypedDict):
     items: list[dict]
 
 
-@measure_execution("Getting Movies from Notion")
-def get_movie_titles_from_notion() -> dict[str, str]:
-    database_info = notion.client.databases.query(database_id=MOVIES_DATABASE_ID)
+class NotionTitleRow(NamedTuple):
+    title: str
+    justwatch_id: Optional[int]
 
+
+movie_titles_query = NotionQuery(
+    MOVIES_DATABASE_ID, filter_properties=["Title", "JustWatch ID"]
+)
+
+
+@metrics.stage("Getting Movies from Notion")
+def get_movie_titles_from_notion() -> dict[str, NotionTitleRow]:
+    return {
+        row["id"]: NotionTitleRow(
+            title=row["properties"]["Title"]["title"][0]["plain_text"],
+            justwatch_id=row["properties"].get("JustWatch ID", {}).get("number"),
+        )
+        for row in movie_titles_query.rows(get_notion().client)
+    }
+
+
+def title_key(title: str) -> str:
+    return strip_all_punctuation(title.lower())
+
+
+def load_known_just_watch_ids(path: str = MOVIES_2023_PATH) -> dict[str, int]:
+    with open(path, "r") as f:
+        return {title_key(movie["title"]): movie["id"] for movie in json.load(f)}
+
+
+def resolve_known_just_watch_ids(
+    rows: dict[str, NotionTitleRow], known_ids: dict[str, int]
+) -> dict[str, Optional[int]]:
+    # an id already in Notion wins, since it's the one we wrote back last run
     return {
-        row["id"]: row["properties"]["Title"]["title"][0]["plain_text"]
-        for row in database_info["results"]
+        id: row.justwatch_id or known_ids.get(title_key(row.title))
+        for id, row in rows.items()
     }
 
 
 def search_just_watch(
-    movie_title: str, release_year=2022
+    movie_title: str,
+    release_year=2022,
+    rate_limiter: Optional[ThreadRateLimiter] = None,
 ) -> Optional[JustWatchSearchResult]:
-    jw_raw_results: PartialJustWatchResponse = just_watch.search_for_item(
-        query=movie_title,
-        release_year_from=release_year,
-        release_year_until=release_year + 1,
-    )
+    if rate_limiter:
+        rate_limiter.wait()
+    with metrics.span("justwatch_request", call="search"):
+        jw_raw_results: PartialJustWatchResponse = get_just_watch().search_for_item(
+            query=movie_title,
+            release_year_from=release_year,
+            release_year_until=release_year + 1,
+        )
 
     search_results = list(
         map(lambda x: JustWatchSearchResult(**x), jw_raw_results["items"])
@@ -45,26 +86,72 @@ def search_just_watch(
     )
 
 
-@measure_execution("Fetching relevant providers")
-def fetch_relevant_providers() -> list[Provider]:
-    provider_results: list[dict] = just_watch.get_providers()
+@metrics.stage("Fetching relevant providers")
+def fetch_relevant_providers() -> ProviderIndex:
+    provider_results: list[dict] = get_just_watch().get_providers()
     provider_collection = ProviderCollection(providers=provider_results)
-    return provider_collection.relevant_providers()
+    return provider_collection.relevant_provider_index()
 
 
-@measure_execution("Getting movies from JustWatch")
-def get_movies_from_just_watch(
-    jw_search_results: dict[str, JustWatchSearchResult]
-) -> dict[str, Movie]:
-    return {
-        id: just_watch.get_title(title_id=jw_search_result.id)
-        for id, jw_search_result in jw_search_results.items()
-    }
+def get_just_watch_title(
+    movie_title: str, justwatch_id: Optional[int], rate_limiter: ThreadRateLimiter
+) -> Optional[dict]:
+    if justwatch_id is None:
+        jw_search_result = search_just_watch(movie_title, rate_limiter=rate_limiter)
+        if not jw_search_result:
+            return None
+        justwatch_id = jw_search_result.id
+    rate_limiter.wait()
+    with metrics.span("justwatch_request", call="get_title"):
+        return get_just_watch().get_title(title_id=justwatch_id)
 
 
-@measure_execution("Inserting into database...")
+@metrics.stage("Getting movies from JustWatch")
+def get_movies_from_just_watch(
+    rows: dict[str, NotionTitleRow],
+    known_ids: dict[str, int],
+    workers: int = JUST_WATCH_WORKERS,
+    requests_per_second: Optional[float] = JUST_WATCH_REQUESTS_PER_SECOND,
+) -> dict[str, dict]:
+    # requests comes in with the JustWatch client; no need to import it earlier
+    from requests import RequestException
+
+    rate_limiter = ThreadRateLimiter(requests_per_second)
+    justwatch_ids = resolve_known_just_watch_ids(rows, known_ids)
+    unresolved = sum(1 for justwatch_id in justwatch_ids.values() if not justwatch_id)
+    print(f"searching JustWatch for {unresolved}/{len(rows)} unresolved titles")
+    just_watch_movies: dict[str, dict] = {}
+
+    # each title's detail fetch starts in the same worker as soon as its
+    # search resolves, instead of waiting for every search to finish
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                get_just_watch_title, row.title, justwatch_ids[id], rate_limiter
+            ): id
+            for id, row in rows.items()
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            id = futures[future]
+            try:
+                jw_movie = future.result()
+            except RequestException as error:
+                print(f"failed to fetch {rows[id].title} from JustWatch: {error!r}")
+                metrics.count("justwatch_titles", outcome="failed")
+                continue
+            if jw_movie:
+                just_watch_movies[id] = jw_movie
+            metrics.count(
+                "justwatch_titles", outcome="found" if jw_movie else "not_found"
+            )
+            metrics.progress("justwatch titles", done, len(rows))
+
+    return just_watch_movies
+
+
+@metrics.stage("Inserting into database...")
 def upsert_to_notion_database(all_props: dict[str, dict]) -> None:
-    total: int = len(all_props)
-    for idx, (id, props) in enumerate(all_props.items()):
-        notion.update_page_props(page_id=id, props=props)
-        print(idx / total, end="\r", flush=True)
+    for done, (id, props) in enumerate(all_props.items(), start=1):
+        get_notion().update_page_props(page_id=id, props=props)
+        metrics.count("notion_ops", outcome="succeeded")
+        metrics.progress("notion updates", done, len(all_props))
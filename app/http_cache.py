@@ -0,0 +1,128 @@
+from datetime import timedelta
+from typing import NamedTuple, Optional
+from collections import Counter
+import sqlite3
+import time
+
+from metrics import metrics
+
+DEFAULT_CACHE_PATH = "data/http_cache.sqlite3"
+
+# watchlist pages always revalidate; everything else is trusted for a while
+RESOURCE_TTLS: dict[str, timedelta] = {
+    "watchlist": timedelta(0),
+    "poster": timedelta(days=30),
+    "film": timedelta(days=7),
+    "availability": timedelta(hours=12),
+}
+
+# Anything still on the watchlist is fetched or revalidated well within this;
+# older entries belong to films that left it. SQLite reuses the pages they
+# free, so pruning keeps the file from growing without a VACUUM.
+RETENTION = timedelta(days=60)
+
+COMMIT_EVERY = 100
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+class HttpCache:
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttls: dict[str, timedelta] = RESOURCE_TTLS,
+    ) -> None:
+        self.ttls = ttls
+        self.stats: Counter[str] = Counter()
+        self.pending_writes = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+
+    def __enter__(self) -> "HttpCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        row = self.connection.execute(
+            "SELECT body, etag, last_modified, fetched_at FROM responses WHERE url = ?",
+            (url,),
+        ).fetchone()
+        return CachedResponse(*row) if row else None
+
+    def is_fresh(self, entry: CachedResponse, resource: str) -> bool:
+        ttl = self.ttls.get(resource, timedelta(0))
+        return time.time() - entry.fetched_at < ttl.total_seconds()
+
+    def conditional_headers(self, entry: CachedResponse) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(
+        self,
+        url: str,
+        body: bytes,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+            (url, body, etag, last_modified, time.time()),
+        )
+        self.mark_written()
+
+    def touch(self, url: str) -> None:
+        self.connection.execute(
+            "UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url)
+        )
+        self.mark_written()
+
+    def mark_written(self) -> None:
+        self.pending_writes += 1
+        if self.pending_writes >= COMMIT_EVERY:
+            self.connection.commit()
+            self.pending_writes = 0
+
+    def prune(self, retention: timedelta = RETENTION) -> int:
+        cursor = self.connection.execute(
+            "DELETE FROM responses WHERE fetched_at < ?",
+            (time.time() - retention.total_seconds(),),
+        )
+        self.connection.commit()
+        self.stats["pruned"] += cursor.rowcount
+        return cursor.rowcount
+
+    def record(self, outcome: str) -> None:
+        self.stats[outcome] += 1
+        metrics.count("http_cache", outcome=outcome)
+
+    def report(self) -> None:
+        print(
+            f"http cache: {self.stats['hit']} hits, "
+            f"{self.stats['revalidated']} revalidated (304), "
+            f"{self.stats['miss']} misses, {self.stats['pruned']} pruned"
+        )
+
+    def close(self) -> None:
+        self.connection.commit()
+        self.connection.close()
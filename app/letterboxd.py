@@ -1,158 +1,387 @@
-from typing import Optional, TypedDict, cast
-from requests import get as sync_get
-from bs4 import BeautifulSoup, Tag
+from functools import lru_cache
+from typing import AsyncIterator, Optional, cast
+import argparse
 import asyncio
+import math
 
 import json
-from assemblers.letterboxd_movie_assembler import Assembler as LetterBoxdMovieAssembler
+from assemblers.letterboxd_movie_assembler import (
+    Assembler as LetterBoxdMovieAssembler,
+    NotionMovieItem,
+)
 
 from models.letterboxd import (
     LetterboxdJustwatchResult,
     LetterboxdMovie,
     LetterboxdResponseCollection,
-    WatchOption,
 )
 
-from shared_items.interfaces import Notion
-from shared_items.utils import pp, measure_execution
+from shared_items.utils import pp
+from constants import STREAMING_PRIORITY_PATH, streaming_priority
+from extractors import ListPage, ParsePool, ParseStage, poster_attrs
+from http_cache import HttpCache
+from metrics import DEFAULT_METRICS_PATH, metrics
+from profiling import DEFAULT_PROFILE_DIR
 from notion_repository import NotionRepo
-from utils import async_aiohttp_get_all_json, async_aiohttp_get_all_text
-
-notion = Notion()
-
-
-with open("app/letterboxd.com_cookies.json", "r") as f:
-    cookies_list = json.load(f)
-
-cookies = {item["name"]: item["value"] for item in cookies_list}
-
-LETTERBOXD_MOVIE_DATA_ATTRS = [
-    "data-film-id",
-    "data-film-name",
-    "data-film-release-year",
-    "data-film-link",
-]
-
-LETTERBOXD_LIST_URL = "https://letterboxd.com/markreckard/watchlist"
-
-
-def find_movies_from_letterboxd_list_page(soup: BeautifulSoup) -> list[dict]:
-    items = soup.find_all("div", {"class": "really-lazy-load"})
-
-    lbxd_urls = [
-        f"https://letterboxd.com/ajax/poster{item.attrs['data-film-slug']}std/125x187/?k={item.attrs['data-cache-busting-key']}"
-        for item in items
-    ]
-
-    results = asyncio.run(async_aiohttp_get_all_text(lbxd_urls))
-
-    all_relevant_attrs: list[dict] = []
-
-    for comp in results:
-        souper = BeautifulSoup(comp, "html.parser")
-        poster = souper.find("div", {"class": "poster"})
-        if isinstance(poster, Tag):
-            relevant_attrs = dict(
-                (k, poster.attrs[k]) for k in LETTERBOXD_MOVIE_DATA_ATTRS
+from run_journal import RunJournal
+from sync_state import SyncState
+from utils import Fetcher, FetchResult, read_json, report_failure
+
+LETTERBOXD_BASE_URL = "https://letterboxd.com"
+LETTERBOXD_LIST_URL = f"{LETTERBOXD_BASE_URL}/markreckard/watchlist"
+LETTERBOXD_POSTER_URL = "https://a.ltrbxd.com/resized/film-poster"
+# the 2x size the poster fragment's srcset serves for list thumbnails
+LETTERBOXD_POSTER_SIZE = "0-250-0-375-crop"
+LETTERBOXD_COOKIES_PATH = "app/letterboxd.com_cookies.json"
+
+
+@lru_cache(maxsize=None)
+def letterboxd_cookies(path: str = LETTERBOXD_COOKIES_PATH) -> dict[str, str]:
+    # read on first scrape rather than at import
+    with open(path, "r") as f:
+        cookies_list = json.load(f)
+
+    return {item["name"]: item["value"] for item in cookies_list}
+
+
+def poster_ajax_url(item: dict) -> str:
+    return f"{LETTERBOXD_BASE_URL}/ajax/poster{item['data-film-slug']}std/125x187/?k={item['data-cache-busting-key']}"
+
+
+def poster_image_url(film_id: str, film_slug: str, cache_busting_key: str) -> str:
+    # poster paths are sharded by the digits of the film id
+    slug_name = film_slug.strip("/").split("/")[-1]
+    return (
+        f"{LETTERBOXD_POSTER_URL}/{'/'.join(film_id)}/"
+        f"{film_id}-{slug_name}-{LETTERBOXD_POSTER_SIZE}.jpg?v={cache_busting_key}"
+    )
+
+
+def list_item_attrs(item: dict) -> Optional[dict]:
+    # the list page usually carries everything the poster fragment does; when
+    # it doesn't (no year, say) this returns None and the fragment is fetched
+    film_id = item.get("data-film-id")
+    film_slug = item.get("data-film-slug")
+    cache_busting_key = item.get("data-cache-busting-key")
+    if not (film_id and film_slug and cache_busting_key):
+        return None
+    attrs = {"data-film-link": item.get("data-target-link") or film_slug, **item}
+    return poster_attrs(attrs, poster_image_url(film_id, film_slug, cache_busting_key))
+
+
+def watchlist_page_url(page_number: int) -> str:
+    if page_number == 1:
+        return f"{LETTERBOXD_LIST_URL}/"
+    return f"{LETTERBOXD_LIST_URL}/page/{page_number}/"
+
+
+def availability_url(movie: LetterboxdMovie) -> str:
+    return (
+        f"{LETTERBOXD_BASE_URL}/s/film-availability?filmId={movie.film_id}&locale=USA"
+    )
+
+
+def film_page_url(movie: LetterboxdMovie) -> str:
+    return f"{LETTERBOXD_BASE_URL}{movie.letterboxd_url}"
+
+
+class LetterboxdScraper:
+    def __init__(
+        self,
+        parse_stage: ParseStage,
+        state: SyncState,
+        list_page_attrs: bool = True,
+        limit: Optional[int] = None,
+    ):
+        self.parse_stage = parse_stage
+        self.fetcher = parse_stage.fetcher
+        self.state = state
+        self.list_page_attrs = list_page_attrs
+        # scrape only the first `limit` films of the watchlist
+        self.limit = limit
+
+    def known_poster_attrs(self, item: dict) -> Optional[dict]:
+        # the list page is free and current; a fresh cached fragment comes next
+        attrs = list_item_attrs(item) if self.list_page_attrs else None
+        return attrs or self.state.fresh_poster_attrs(item.get("data-film-id"))
+
+    def stale_poster_attrs(self, item: dict, result: FetchResult) -> dict:
+        # a film missing from the scrape reads as one that left the watchlist,
+        # so its notion row would be archived; old attrs are better than that
+        attrs = self.state.last_poster_attrs(item.get("data-film-id"))
+        if attrs is None:
+            raise RuntimeError(f"could not fetch poster {result.url}") from result.error
+        return attrs
+
+    async def find_movies_from_letterboxd_list_page(
+        self, items: list[dict]
+    ) -> list[dict]:
+        # only films we can't build from known attrs pay for the poster ajax
+        known_attrs = [self.known_poster_attrs(item) for item in items]
+        results = iter(
+            await asyncio.gather(
+                *[
+                    self.parse_stage.fetch(
+                        poster_ajax_url(item), "poster", resource="poster"
+                    )
+                    for item, attrs in zip(items, known_attrs)
+                    if attrs is None
+                ]
             )
-            img = poster.find("img")
-            if isinstance(img, Tag):
-                srcset = img.get("srcset")
-                url = cast(str, srcset).replace(" 2x", "")
-                relevant_attrs["poster_url"] = url
+        )
+
+        all_relevant_attrs: list[dict] = []
+
+        for item, relevant_attrs in zip(items, known_attrs):
+            if relevant_attrs is None:
+                result = next(results)
+                if not result.ok:
+                    report_failure(result)
+                    all_relevant_attrs.append(self.stale_poster_attrs(item, result))
+                    continue
+                relevant_attrs = result.content
+                if relevant_attrs is None:
+                    continue
+                self.state.record_poster(relevant_attrs)
             all_relevant_attrs.append(relevant_attrs)
 
-    return all_relevant_attrs
-
-
-@measure_execution("fetching movies from letterboxd")
-def fetch_all_movies_from_letterboxd() -> list[dict]:
-    every_relevant_attrs: list[dict] = []
-    url: str = LETTERBOXD_LIST_URL
-
-    while True:
-        resp = sync_get(url, cookies=cookies)
-
-        soup = BeautifulSoup(resp.text, "html.parser")
-        next_paginator: Tag = soup.find_all("div", {"class": "paginate-nextprev"})[1]
-        more_link = next_paginator.find("a")
-
-        every_relevant_attrs += find_movies_from_letterboxd_list_page(soup)
-
-        if isinstance(more_link, Tag):
-            href = more_link.attrs["href"]
-            url = f"https://letterboxd.com{href}"
+        return all_relevant_attrs
+
+    async def fetch_watchlist_page(self, page_number: int) -> ListPage:
+        url = watchlist_page_url(page_number)
+        result = await self.parse_stage.fetch(url, "list_page", resource="watchlist")
+        if not result.ok:
+            # a missing watchlist page would read as removed films downstream
+            raise RuntimeError(
+                f"could not fetch watchlist page {url}"
+            ) from result.error
+        return result.content
+
+    async def fetch_movies_from_watchlist_page(self, page_number: int) -> list[dict]:
+        list_page = await self.fetch_watchlist_page(page_number)
+        return await self.find_movies_from_letterboxd_list_page(list_page.items)
+
+    async def fetch_all_movies_from_letterboxd(self) -> list[dict]:
+        first_page = await self.fetch_watchlist_page(1)
+        page_count = first_page.page_count
+        if self.limit is not None and first_page.items:
+            # a sample only needs the pages its first films are on
+            page_count = min(page_count, math.ceil(self.limit / len(first_page.items)))
+
+        # every page goes straight on to its poster fetches as soon as it lands,
+        # so pages and posters overlap instead of alternating
+        pages = await asyncio.gather(
+            self.find_movies_from_letterboxd_list_page(first_page.items[: self.limit]),
+            *[
+                self.fetch_movies_from_watchlist_page(page_number)
+                for page_number in range(2, page_count + 1)
+            ],
+        )
+
+        all_relevant_attrs = [attrs for page in pages for attrs in page]
+        return all_relevant_attrs[: self.limit]
+
+    async def refresh_availability(self, movie: LetterboxdMovie) -> None:
+        if self.state.needs_availability(movie.film_id):
+            result = await self.fetcher.fetch(
+                availability_url(movie), read_json, resource="availability"
+            )
+            if result.ok:
+                try:
+                    availability = LetterboxdJustwatchResult(**result.content)
+                except (ValueError, TypeError) as error:
+                    # a body that isn't the availability payload fails this
+                    # film's refresh, not the sync
+                    report_failure(FetchResult(result.url, error=error))
+                else:
+                    self.state.record_availability(
+                        movie.film_id, availability.best_option()
+                    )
+            else:
+                report_failure(result)
+
+        # on a failed refresh the last known option is better than none
+        movie.justwatch_watch_option = self.state.film(movie.film_id).watch_option
+
+    async def refresh_metadata(self, movie: LetterboxdMovie) -> None:
+        if self.state.needs_metadata(movie.film_id):
+            result = await self.parse_stage.fetch(
+                film_page_url(movie), "film_page", resource="film"
+            )
+            if result.ok:
+                runtime, genres = result.content
+                self.state.record_metadata(movie.film_id, runtime, genres)
+            else:
+                report_failure(result)
+
+        film = self.state.film(movie.film_id)
+        movie.runtime, movie.genres = film.runtime, film.genres
+
+    async def fetch_film_details(self, movie: LetterboxdMovie) -> LetterboxdMovie:
+        await asyncio.gather(
+            self.refresh_availability(movie),
+            self.refresh_metadata(movie),
+        )
+        return movie
+
+    async def stream_film_details(
+        self, movies: list[LetterboxdMovie]
+    ) -> AsyncIterator[LetterboxdMovie]:
+        # films come out as soon as both of their requests finish, so only the
+        # in-flight pages are ever held in memory
+        for film_task in asyncio.as_completed(
+            [self.fetch_film_details(movie) for movie in movies]
+        ):
+            yield await film_task
+
+    async def movie_items(self) -> list[NotionMovieItem]:
+        all_movies = await self.fetch_all_movies_from_letterboxd()
+        letterboxd_collection = LetterboxdResponseCollection(movies=all_movies)
+
+        movie_items = [
+            LetterBoxdMovieAssembler(movie).notion_movie_item()
+            async for movie in self.stream_film_details(letterboxd_collection.movies)
+        ]
+
+        # a sample hasn't seen the rest of the watchlist, so it can't prune it
+        if self.limit is None:
+            self.state.prune(movie.film_id for movie in letterboxd_collection.movies)
+        return movie_items
+
+
+async def run_letterboxd_pipeline(
+    cache: HttpCache,
+    state: SyncState,
+    parse_pool: ParsePool,
+    limit: Optional[int] = None,
+) -> list[NotionMovieItem]:
+    # one loop and one pooled session for every stage, so connections are reused
+    async with Fetcher(cookies=letterboxd_cookies(), cache=cache) as fetcher:
+        async with ParseStage(fetcher, parse_pool) as parse_stage:
+            scraper = LetterboxdScraper(parse_stage, state, limit=limit)
+            return await scraper.movie_items()
+
+
+@metrics.stage("fetching and assembling movies from letterboxd")
+def fetch_letterboxd_movie_items(
+    incremental: bool = True,
+    parse_workers: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> list[NotionMovieItem]:
+    # a non-incremental run starts from empty state, so every film is refetched
+    state = SyncState(load=incremental)
+    with HttpCache() as cache, ParsePool(workers=parse_workers) as parse_pool:
+        movie_items = asyncio.run(
+            run_letterboxd_pipeline(cache, state, parse_pool, limit)
+        )
+        cache.prune()
+        cache.report()
+    state.save()
+    return movie_items
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Sync the Letterboxd watchlist into Notion"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="finish the last interrupted run from its journal, without rescraping",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="scrape and diff as usual, but write nothing to notion",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        metavar="N",
+        help="sample only the first N films of the watchlist",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=DEFAULT_PROFILE_DIR,
+        metavar="DIR",
+        help=(
+            "write a cProfile dump and an allocation report per stage to DIR; "
+            "parsing runs inline so it shows up in the profile"
+        ),
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=DEFAULT_METRICS_PATH,
+        help="append per-stage and per-request spans here as JSON lines",
+    )
+    parser.add_argument(
+        "--prometheus-textfile",
+        help="also write counters and span totals here for node_exporter",
+    )
+    args = parser.parse_args(argv)
+    if args.resume and (args.dry_run or args.limit is not None):
+        parser.error("--resume finishes the journaled run as it was started")
+    if args.limit is not None and args.limit < 1:
+        parser.error("--limit must be at least 1")
+    try:
+        # a bad ranking file should stop the run here, not halfway through it
+        streaming_priority()
+    except ValueError as error:
+        parser.error(f"{STREAMING_PRIORITY_PATH}: {error}")
+
+    # cProfile can't see into the parse pool's processes, so profile inline
+    parse_workers = 0 if args.profile else None
+    metrics.open(args.metrics_file, profile_dir=args.profile)
+    try:
+        if args.dry_run:
+            dry_run(args.limit, parse_workers)
         else:
-            break
-
-    return every_relevant_attrs
-
-
-class ExtraDatasDict(TypedDict):
-    runtime: list[str]
-    genres_list: list[list[str]]
-
-
-@measure_execution("fetching extra_data from letterboxd")
-def fetch_film_data_from_letterboxd(movies: list[LetterboxdMovie]) -> ExtraDatasDict:
-    all_film_page_urls = [
-        f"https://letterboxd.com{movie.letterboxd_url}" for movie in movies
-    ]
-
-    results = asyncio.run(async_aiohttp_get_all_text(all_film_page_urls))
-
-    extra_datas: ExtraDatasDict = {"runtime": [], "genres_list": []}
-
-    for page in results:
-        soup = BeautifulSoup(page, "html.parser")
-        runtime_el = soup.find("p", {"class": "text-link"})
-        if isinstance(runtime_el, Tag):
-            runtime_strings = list(runtime_el.stripped_strings)
-            runtime = runtime_strings[0].split("\xa0")[0]
-            extra_datas["runtime"].append(runtime if runtime.isdigit() else "")
-        genres_parent_el = soup.find("div", {"id": "tab-genres"})
-        if isinstance(genres_parent_el, Tag):
-            genre_el = genres_parent_el.find("div")
-            if isinstance(genre_el, Tag):
-                genres_list = list(genre_el.stripped_strings)
-                extra_datas["genres_list"].append(genres_list)
-
-    return extra_datas
-
-
-@measure_execution("fetching watchability from letterboxd/justwatch")
-def fetch_jw_results_via_letterboxd(
-    movies: list[LetterboxdMovie],
-) -> list[Optional[WatchOption]]:
-    all_availability_urls = [
-        f"https://letterboxd.com/s/film-availability?filmId={movie.film_id}&locale=USA"
-        for movie in movies
-    ]
-    results: list[dict] = asyncio.run(async_aiohttp_get_all_json(all_availability_urls))
-
-    letterboxd_justwatch_results = [
-        LetterboxdJustwatchResult(**result) for result in results
-    ]
-
-    return [result.best_option() for result in letterboxd_justwatch_results]
-
-
-all_movies = fetch_all_movies_from_letterboxd()
-letterboxd_collection = LetterboxdResponseCollection(movies=all_movies)
-best_options = fetch_jw_results_via_letterboxd(letterboxd_collection.movies)
-extra_data = fetch_film_data_from_letterboxd(letterboxd_collection.movies)
-
-
-for idx, movie in enumerate(letterboxd_collection.movies):
-    movie.justwatch_watch_option = best_options[idx]
-    movie.runtime = extra_data["runtime"][idx]
-    movie.genres = extra_data["genres_list"][idx]
-
-
-def assemble_notion_items(movies: list[LetterboxdMovie]):
-    return [LetterBoxdMovieAssembler(movie).notion_movie_item() for movie in movies]
-
-
-assembled_items = assemble_notion_items(letterboxd_collection.movies)
-
-NotionRepo(assembled_items).update_them_shits()
+            sync(args.resume, args.limit, parse_workers)
+    finally:
+        metrics.close(args.prometheus_textfile)
+
+
+def dry_run(limit: Optional[int], parse_workers: Optional[int] = None) -> None:
+    # no journal either: there are no writes to resume
+    assembled_items = fetch_letterboxd_movie_items(
+        parse_workers=parse_workers, limit=limit
+    )
+    NotionRepo(
+        assembled_items, dry_run=True, sampled=limit is not None
+    ).update_them_shits()
+
+
+def sync(
+    resume: bool,
+    limit: Optional[int] = None,
+    parse_workers: Optional[int] = None,
+) -> None:
+    journal = RunJournal()
+    if resume and journal.load():
+        assembled_items = cast(list[NotionMovieItem], journal.items)
+        print(
+            f"resuming: {len(assembled_items)} films scraped, "
+            f"{len(journal.completed_keys)} notion writes already done"
+        )
+        journal.reopen()
+    else:
+        if resume:
+            print("nothing to resume, starting a fresh run")
+        assembled_items = fetch_letterboxd_movie_items(
+            parse_workers=parse_workers, limit=limit
+        )
+        journal.start(assembled_items, sampled=limit is not None)
+
+    repo = NotionRepo(assembled_items, journal, sampled=journal.sampled)
+    report = repo.update_them_shits()
+    if report.failed_keys:
+        journal.close()
+        print("some writes failed; rerun with --resume to retry them")
+    else:
+        journal.finish()
+
+
+# guarded so parse-pool workers that re-import this module don't rerun the sync
+if __name__ == "__main__":
+    main()
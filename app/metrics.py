@@ -0,0 +1,181 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ContextManager,
+    Iterator,
+    Optional,
+    TextIO,
+    TypeVar,
+    cast,
+)
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+if TYPE_CHECKING:
+    from profiling import StageProfiler
+
+DEFAULT_METRICS_PATH = "data/metrics.jsonl"
+PROMETHEUS_PREFIX = "movies_sync"
+
+Labels = tuple[tuple[str, str], ...]
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def label_key(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = (f'{key}="{escape_label_value(value)}"' for key, value in labels)
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metrics:
+    # Spans (stages, HTTP requests, Notion writes) are appended to a JSON-lines
+    # file as they finish, so a run that dies still leaves its timings
+    # behind. Counters and per-span totals are kept in memory and written
+    # out at the end, and can also go to a Prometheus textfile.
+    def __init__(self) -> None:
+        self.run_id = uuid.uuid4().hex[:12]
+        self.counters: Counter[tuple[str, Labels]] = Counter()
+        self.span_seconds: dict[str, float] = defaultdict(float)
+        self.span_counts: Counter[str] = Counter()
+        self.file: Optional[TextIO] = None
+        self.profiler: Optional["StageProfiler"] = None
+        # the JustWatch fetchers record from a thread pool
+        self.lock = threading.Lock()
+
+    def open(
+        self, path: str = DEFAULT_METRICS_PATH, profile_dir: Optional[str] = None
+    ) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        if profile_dir:
+            from profiling import StageProfiler
+
+            self.profiler = StageProfiler(profile_dir)
+            self.profiler.start()
+        # line buffered, so every finished span reaches the file
+        self.file = open(path, "a", buffering=1)
+        self.emit({"type": "run", "argv": sys.argv})
+
+    def emit(self, record: dict) -> None:
+        if self.file:
+            record = {"run": self.run_id, "at": round(time.time(), 3), **record}
+            line = json.dumps(record, default=str) + "\n"
+            with self.lock:
+                self.file.write(line)
+
+    def count(self, name: str, value: int = 1, **labels: Any) -> None:
+        with self.lock:
+            self.counters[(name, label_key(labels))] += value
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[dict]:
+        # callers add attributes (status, bytes...) to the yielded dict
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as error:
+            attrs.setdefault("error", repr(error))
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            with self.lock:
+                self.span_seconds[name] += duration
+                self.span_counts[name] += 1
+            self.emit(
+                {
+                    "type": "span",
+                    "name": name,
+                    "duration_s": round(duration, 6),
+                    **attrs,
+                }
+            )
+
+    def stage(self, name: str) -> Callable[[F], F]:
+        def decorator(function: F) -> F:
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span("stage", stage=name) as span, self.profiled(name, span):
+                    started = time.perf_counter()
+                    result = function(*args, **kwargs)
+                # the log line the nightly log has always had per stage
+                print(f"{name} {time.perf_counter() - started:.3f}s")
+                return result
+
+            return cast(F, wrapper)
+
+        return decorator
+
+    def profiled(self, name: str, attrs: dict) -> ContextManager:
+        if self.profiler:
+            return self.profiler.profile(name, attrs)
+        return nullcontext()
+
+    def progress(self, name: str, done: int, total: int) -> None:
+        # only redraw a live terminal; in a log file \r progress is noise
+        if sys.stdout.isatty():
+            print(f"{name}: {done}/{total}", end="\r", flush=True)
+
+    def close(self, prometheus_path: Optional[str] = None) -> None:
+        self.emit(
+            {
+                "type": "counters",
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+            }
+        )
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
+        if self.file:
+            self.file.close()
+        self.file = None
+        if self.profiler:
+            self.profiler.stop()
+        self.profiler = None
+
+    def prometheus_lines(self) -> list[str]:
+        lines = []
+        for name in sorted({name for name, _ in self.counters}):
+            metric = f"{PROMETHEUS_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(
+                f"{metric}{prometheus_labels(labels)} {value}"
+                for (counter, labels), value in sorted(self.counters.items())
+                if counter == name
+            )
+        metric = f"{PROMETHEUS_PREFIX}_span_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for name in sorted(self.span_counts):
+            labels = prometheus_labels((("span", name),))
+            lines.append(f"{metric}_sum{labels} {self.span_seconds[name]:.6f}")
+            lines.append(f"{metric}_count{labels} {self.span_counts[name]}")
+        return lines
+
+    def write_prometheus(self, path: str) -> None:
+        # written then renamed, so the node exporter never reads half a file
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(target.name + ".tmp")
+        partial.write_text("\n".join(self.prometheus_lines()) + "\n")
+        os.replace(partial, target)
+
+
+metrics = Metrics()
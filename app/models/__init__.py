@@ -1 +1 @@
-from .models import Provider, Offer, Upcoming, Movie
+from .models import Provider, ProviderIndex, Offer, Upcoming, MovieSummary, Movie
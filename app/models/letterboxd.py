@@ -2,7 +2,7 @@ from __future__ import annotations
 from typing import Literal, Optional, cast
 from urllib.parse import urljoin, urlparse
 from pydantic import BaseModel, Field, validator
-from constants import RELEVANT_STREAMING_SERVICES
+from constants import streaming_priority
 from shared_items.utils import pp
 
 
@@ -83,16 +83,13 @@ class WatchOptionCollection(BaseModel):
 
     def best_option(self) -> Optional[WatchOption]:
         if self.type == "stream":
-            streaming_names = [
-                service["clear_name"] for service in RELEVANT_STREAMING_SERVICES
-            ]
-            return next(
-                (
-                    option
-                    for option in self.watch_options
-                    if option.name in streaming_names
-                ),
-                None,
+            # the options are already cheapest first, and min keeps the first
+            # of equally ranked services
+            priority = streaming_priority()
+            return min(
+                (option for option in self.watch_options if option.name in priority),
+                key=lambda option: priority[option.name],
+                default=None,
             )
         else:
             return self.watch_options[0] if self.watch_options else None
@@ -1,8 +1,8 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, PrivateAttr
+from typing import ClassVar, Iterable, Optional
 from shared_items.utils import pp, strip_all_punctuation, reversor
 
-from constants import RELEVANT_STREAMING_SERVICES
+from constants import RELEVANT_STREAMING_SHORT_NAMES
 
 
 class Provider(BaseModel):
@@ -21,20 +21,38 @@ class Provider(BaseModel):
     technical_name: str
 
 
+class ProviderIndex:
+    # built once per run and shared by every Offer, rather than each offer
+    # carrying (and pydantic re-validating) its own copy of the providers
+    def __init__(self, providers: Iterable[Provider]) -> None:
+        self.by_short_name: dict[str, Provider] = {
+            provider.short_name: provider for provider in providers
+        }
+        self.short_names: frozenset[str] = frozenset(self.by_short_name)
+
+    def __contains__(self, short_name: str) -> bool:
+        return short_name in self.short_names
+
+    def __getitem__(self, short_name: str) -> Provider:
+        return self.by_short_name[short_name]
+
+    def __len__(self) -> int:
+        return len(self.short_names)
+
+
 class ProviderCollection(BaseModel):
     providers: list[Provider]
 
     def relevant_providers(self) -> list[Provider]:
-        relevant_streaming_ids_short_names = list(
-            map(lambda x: x["short_name"], RELEVANT_STREAMING_SERVICES)
-        )
-
         return [
             provider
             for provider in self.providers
-            if provider.short_name in relevant_streaming_ids_short_names
+            if provider.short_name in RELEVANT_STREAMING_SHORT_NAMES
         ]
 
+    def relevant_provider_index(self) -> ProviderIndex:
+        return ProviderIndex(self.relevant_providers())
+
 
 class Offer(BaseModel):
     country: str
@@ -46,10 +64,11 @@ class Offer(BaseModel):
     provider_id: int
     urls: dict
     retail_price: Optional[float]
-    providers: Optional[list[Provider]]
+    _provider_index: Optional[ProviderIndex] = PrivateAttr(default=None)
 
-    def __init__(self, **kwargs):
+    def __init__(self, provider_index: Optional[ProviderIndex] = None, **kwargs):
         super().__init__(**kwargs)
+        self._provider_index = provider_index
 
     @property
     def price(self) -> Optional[str]:
@@ -81,22 +100,18 @@ class Offer(BaseModel):
 
     @property
     def relevant(self) -> bool:
-        return self.package_short_name in [
-            provider.short_name for provider in (self.providers or [])
-        ]
+        return (
+            self._provider_index is not None
+            and self.package_short_name in self._provider_index
+        )
 
     @property
     def for_me(self) -> bool:
         return (self.streaming or self.rental) and self.watchable and self.relevant
 
     def streaming_service(self) -> str:
-        return next(
-            (
-                x.clear_name
-                for x in (self.providers or [])
-                if x.short_name == self.package_short_name
-            )
-        )
+        assert self._provider_index is not None
+        return self._provider_index[self.package_short_name].clear_name
 
     @property
     def human_text(self) -> str:
@@ -132,18 +147,71 @@ class JustWatchSearchResult(BaseModel):
         )
 
 
-class Movie(BaseModel):
-    title: str
+class MovieSummary(BaseModel):
+    # only the fields MovieAssembler reads get validated; everything else in
+    # the get_title payload (clips, credits, backdrops...) stays raw
+    id: int
     full_path: str
+    original_release_year: int
+    runtime: int
+    offers: Optional[list[Offer]]
+    _raw: dict = PrivateAttr(default_factory=dict)
+    _sorted_relevant_offers: Optional[list[Offer]] = PrivateAttr(default=None)
+
+    validate_all_offers: ClassVar[bool] = False
+
+    def __init__(self, provider_index: ProviderIndex, **kwargs):
+        raw_offers = kwargs.get("offers") or []
+        if raw_offers:
+            # an offer on a provider outside the index can never be for_me,
+            # so the summary doesn't pay to validate it
+            kwargs["offers"] = [
+                Offer(provider_index, **x)
+                for x in raw_offers
+                if self.validate_all_offers or x["package_short_name"] in provider_index
+            ]
+        super().__init__(**kwargs)
+        self._raw = {
+            key: value for key, value in kwargs.items() if key not in self.__fields__
+        }
+        if raw_offers and not self.validate_all_offers:
+            self._raw["offers"] = raw_offers
+
+    @property
+    def raw(self) -> dict:
+        return self._raw
+
+    @property
+    def just_watch_url(self) -> str:
+        return f"https://justwatch.com{self.full_path}"
+
+    def relevant_offers(self) -> list[Offer]:
+        return self.sorted_relevant_offers()
+
+    def sorted_relevant_offers(self) -> list[Offer]:
+        # offers never change after validation, so filter and sort them once
+        if self._sorted_relevant_offers is None:
+            self._sorted_relevant_offers = sorted(
+                (offer for offer in (self.offers or []) if offer.for_me),
+                key=lambda k: (reversor(k.watch_type), k.presentation_type, k.price),
+            )
+        return self._sorted_relevant_offers
+
+    @property
+    def best_offer(self) -> Offer:
+        return self.sorted_relevant_offers()[0]
+
+
+class Movie(MovieSummary):
+    validate_all_offers: ClassVar[bool] = True
+
+    title: str
     full_paths: dict
     jw_entity_id: str
     object_type: str
-    id: int
-    original_release_year: int
     poster: str
     poster_blur_hash: str
     scoring: list[dict]
-    offers: Optional[list[Offer]]
     backdrops: list[dict]
     short_description: str
     original_title: str
@@ -154,34 +222,6 @@ class Movie(BaseModel):
     upcoming: Optional[list[Upcoming]]
     genre_ids: list[int]
     age_certification: Optional[str]
-    runtime: int
     production_countries: list[str]
     promoted_bundles: Optional[list[dict]]
     permanent_audiences: Optional[list[str]]
-
-    def __init__(self, relevant_providers: list[Provider], **kwargs):
-        if kwargs.get("offers"):
-            kwargs["offers"] = [
-                Offer(**x, providers=relevant_providers) for x in kwargs["offers"]
-            ]
-        super().__init__(**kwargs)
-
-    @property
-    def just_watch_url(self) -> str:
-        return f"https://justwatch.com{self.full_path}"
-
-    def relevant_offers(self) -> list[Offer]:
-        if not self.offers:
-            return []
-
-        return [offer for offer in self.offers if offer.for_me]
-
-    def sorted_relevant_offers(self) -> list[Offer]:
-        return sorted(
-            self.relevant_offers(),
-            key=lambda k: (reversor(k.watch_type), k.presentation_type, k.price),
-        )
-
-    @property
-    def best_offer(self) -> Offer:
-        return self.sorted_relevant_offers()[0]
@@ -1,51 +1,112 @@
 from typing import Optional
-from shared_items.interfaces import Notion
-from shared_items.utils import pp, measure_execution
+import argparse
+from itertools import islice
+
+from shared_items.utils import pp
 from assemblers.movie_assembler import MovieAssembler
-from models import Movie
+from clients import get_notion
+from metrics import DEFAULT_METRICS_PATH, metrics
+from models import MovieSummary
+from models.models import ProviderIndex
+from profiling import DEFAULT_PROFILE_DIR
 from fetchers import (
     fetch_relevant_providers,
     get_movies_from_just_watch,
     upsert_to_notion_database,
-    search_just_watch,
     get_movie_titles_from_notion,
+    load_known_just_watch_ids,
 )
-from models.models import JustWatchSearchResult
 
-notion = Notion()
 
-relevant_providers = fetch_relevant_providers()
+@metrics.stage("Validating JustWatch movies")
+def validate_just_watch_movies(
+    provider_index: ProviderIndex, just_watch_movies: dict[str, dict]
+) -> dict[str, MovieSummary]:
+    return {
+        id: MovieSummary(provider_index, **jw_movie)
+        for id, jw_movie in just_watch_movies.items()
+    }
+
+
+@metrics.stage("Assembling notion props")
+def assemble_all_props(ids_with_movies: dict[str, MovieSummary]) -> dict[str, dict]:
+    assembled_items = {
+        id: MovieAssembler(movie).notion_movie_item()
+        for id, movie in ids_with_movies.items()
+    }
+
+    return {
+        id: get_notion().assemble_props(movie_item.format_for_notion_interface())
+        for id, movie_item in assembled_items.items()
+    }
+
 
-existing_movie_titles_from_notion = get_movie_titles_from_notion()
+def sync(dry_run: bool = False, limit: Optional[int] = None) -> None:
+    provider_index = fetch_relevant_providers()
 
+    existing_movie_titles_from_notion = get_movie_titles_from_notion()
+    if limit is not None:
+        existing_movie_titles_from_notion = dict(
+            islice(existing_movie_titles_from_notion.items(), limit)
+        )
 
-@measure_execution("Fetching Just Watch Info")
-def fetch_all_just_watch_info(
-    ids_with_titles: dict[str, str]
-) -> dict[str, Optional[JustWatchSearchResult]]:
-    return {id: search_just_watch(title) for id, title in ids_with_titles.items()}
+    just_watch_movies = get_movies_from_just_watch(
+        existing_movie_titles_from_notion, load_known_just_watch_ids()
+    )
 
+    ids_with_movies = validate_just_watch_movies(provider_index, just_watch_movies)
+    all_props = assemble_all_props(ids_with_movies)
 
-jw_search_results = fetch_all_just_watch_info(existing_movie_titles_from_notion)
+    if dry_run:
+        print(f"dry run: skipping {len(all_props)} notion updates")
+        return
+    upsert_to_notion_database(all_props)
 
-just_watch_movies = get_movies_from_just_watch(jw_search_results)
 
-ids_with_movies = {
-    id: Movie(relevant_providers, **jw_movie)
-    for id, jw_movie in just_watch_movies.items()
-}
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Refresh where each movie in Notion can be watched"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="look everything up as usual, but write nothing to notion",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        metavar="N",
+        help="sample only the first N movies in notion",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=DEFAULT_PROFILE_DIR,
+        metavar="DIR",
+        help="write a cProfile dump and an allocation report per stage to DIR",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=DEFAULT_METRICS_PATH,
+        help="append per-stage and per-request spans here as JSON lines",
+    )
+    parser.add_argument(
+        "--prometheus-textfile",
+        help="also write counters and span totals here for node_exporter",
+    )
+    args = parser.parse_args(argv)
+    if args.limit is not None and args.limit < 1:
+        parser.error("--limit must be at least 1")
 
-assembled_items = {
-    id: MovieAssembler(movie).notion_movie_item()
-    for id, movie in ids_with_movies.items()
-}
+    metrics.open(args.metrics_file, profile_dir=args.profile)
+    try:
+        sync(args.dry_run, args.limit)
+    finally:
+        metrics.close(args.prometheus_textfile)
 
-all_props = {
-    id: notion.assemble_props(movie_item.format_for_notion_interface())
-    for id, movie_item in assembled_items.items()
-}
 
-upsert_to_notion_database(all_props)
+if __name__ == "__main__":
+    main()
 
 """
 TODOs:
@@ -0,0 +1,88 @@
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+from urllib.parse import unquote
+
+NOTION_PAGE_SIZE = 100
+# Notion caps how many conditions one compound filter may hold
+MAX_FILTER_CONDITIONS = 100
+
+
+def equals_filter(property: str, property_type: str, value: Any) -> dict:
+    return {"property": property, property_type: {"equals": value}}
+
+
+def any_of_filter(property: str, property_type: str, values: Iterable[Any]) -> dict:
+    return {"or": [equals_filter(property, property_type, value) for value in values]}
+
+
+def all_of_filter(*filters: Optional[dict]) -> Optional[dict]:
+    present = [filter for filter in filters if filter]
+    if len(present) < 2:
+        return present[0] if present else None
+    return {"and": present}
+
+
+@lru_cache(maxsize=None)
+def property_ids(client: Any, database_id: str) -> dict[str, str]:
+    # filter_properties takes property ids, which only the schema knows. They
+    # come back url-encoded, and the http client encodes query params itself.
+    database = client.databases.retrieve(database_id=database_id)
+    return {name: unquote(prop["id"]) for name, prop in database["properties"].items()}
+
+
+class NotionQuery(NamedTuple):
+    database_id: str
+    filter: Optional[dict] = None
+    # only these columns come back, which keeps read payloads small
+    filter_properties: Optional[list[str]] = None
+    page_size: int = NOTION_PAGE_SIZE
+
+    def where(self, filter: Optional[dict]) -> "NotionQuery":
+        return self._replace(filter=all_of_filter(self.filter, filter))
+
+    def query_body(self) -> dict[str, Any]:
+        body: dict[str, Any] = {"page_size": self.page_size}
+        if self.filter:
+            body["filter"] = self.filter
+        return body
+
+    def query_params(self, client: Any) -> Optional[dict[str, Any]]:
+        if not self.filter_properties:
+            return None
+        ids = property_ids(client, self.database_id)
+        return {
+            "filter_properties": [
+                ids[name] for name in self.filter_properties if name in ids
+            ]
+        }
+
+    def rows(self, client: Any) -> Iterator[dict]:
+        # databases.query in notion-client 2.0 drops filter_properties, so the
+        # request is sent directly with it as a query parameter
+        path = f"databases/{self.database_id}/query"
+        body = self.query_body()
+        params = self.query_params(client)
+        # only one page of raw rows is alive at a time, however big the database
+        while True:
+            response = client.request(path, "POST", query=params, body=body)
+            yield from response["results"]
+            if not response["has_more"]:
+                return
+            body = {**body, "start_cursor": response["next_cursor"]}
+
+    def rows_where_in(
+        self, client: Any, property: str, property_type: str, values: Iterable[Any]
+    ) -> Iterator[dict]:
+        # one query per batch, since a compound filter can only be so long
+        batch: list[Any] = []
+        for value in values:
+            batch.append(value)
+            if len(batch) == MAX_FILTER_CONDITIONS:
+                yield from self.where(
+                    any_of_filter(property, property_type, batch)
+                ).rows(client)
+                batch = []
+        if batch:
+            yield from self.where(any_of_filter(property, property_type, batch)).rows(
+                client
+            )
@@ -1,86 +1,204 @@
 import asyncio
-from typing import Any, Optional, cast
-from shared_items.utils import measure_execution
-from shared_items.interfaces.notion import Notion, collect_paginated_api
-from assemblers.letterboxd_movie_assembler import NotionMovieItem
+from typing import Iterable, Iterator, NamedTuple, Optional
+from assemblers.letterboxd_movie_assembler import (
+    LETTERBOXD_ID_COLUMN,
+    MOVIE_SCHEMA,
+    NotionMovieItem,
+    movie_fingerprint,
+    notion_row_column_values,
+)
+from notion_writer import (
+    NotionWriter,
+    WriteOp,
+    WriteReport,
+    archive_page_op,
+    create_page_op,
+    update_page_op,
+)
+from clients import get_notion
+from metrics import metrics
+from run_journal import RunJournal
+from notion_query import NotionQuery, equals_filter
 from shared import MOVIE_DATABASE_ID
 
-notion = Notion()
+# the columns NotionMovieItem.column_values reads; nothing else is fetched
+DIFF_PROPERTIES = [
+    "Title",
+    "Year",
+    "Runtime",
+    "Location",
+    "Letterboxd ID",
+    "Letterboxd Link",
+    "Poster",
+]
 
+existing_movies_query = NotionQuery(
+    MOVIE_DATABASE_ID, filter_properties=DIFF_PROPERTIES
+)
 
-def recursively_fetch_existing_notion_movies(
-    filter: Optional[dict] = None,
-) -> list[dict]:
-    kwargs: dict[str, Any] = {"database_id": MOVIE_DATABASE_ID}
-    if filter:
-        kwargs["filter"] = filter
-    return collect_paginated_api(notion.client.databases.query, **kwargs)
+
+def iter_existing_notion_movies(filter: Optional[dict] = None) -> Iterator[dict]:
+    return existing_movies_query.where(filter).rows(get_notion().client)
+
+
+def iter_existing_notion_movies_by_letterboxd_id(
+    letterboxd_ids: Iterable[str],
+) -> Iterator[dict]:
+    return existing_movies_query.rows_where_in(
+        get_notion().client, "Letterboxd ID", "rich_text", letterboxd_ids
+    )
+
+
+def letterboxd_id_filter(letterboxd_id: str) -> dict:
+    return equals_filter("Letterboxd ID", "rich_text", letterboxd_id)
+
+
+class ExistingMovie(NamedTuple):
+    notion_id: str
+    fingerprint: tuple[int, ...]
+
+
+class ExistingMovieIndex(NamedTuple):
+    by_letterboxd_id: dict[str, ExistingMovie]
+    # extra rows for a letterboxd id that's already indexed; always deleted
+    duplicates: list[ExistingMovie]
+
+
+def index_existing_movies(notion_rows: Iterable[dict]) -> ExistingMovieIndex:
+    index = ExistingMovieIndex({}, [])
+    for row in notion_rows:
+        column_values = notion_row_column_values(row)
+        letterboxd_id = column_values[LETTERBOXD_ID_COLUMN]
+        existing = ExistingMovie(row["id"], movie_fingerprint(column_values))
+        if letterboxd_id in index.by_letterboxd_id:
+            index.duplicates.append(existing)
+        else:
+            index.by_letterboxd_id[letterboxd_id] = existing
+    return index
+
+
+class MovieUpdate(NamedTuple):
+    notion_id: str
+    # a Notion properties body holding only the columns that changed
+    properties: dict
+
+
+class MovieItemDiff(NamedTuple):
+    delete_list: list[ExistingMovie]
+    update_list: list[MovieUpdate]
+    do_nothing_list: list[ExistingMovie]
+    add_list: list[NotionMovieItem]
 
 
 class NotionRepo:
-    def __init__(self, fresh_movie_items: list[NotionMovieItem]):
+    def __init__(
+        self,
+        fresh_movie_items: list[NotionMovieItem],
+        journal: Optional[RunJournal] = None,
+        dry_run: bool = False,
+        sampled: bool = False,
+    ):
         self.fresh_movie_items = fresh_movie_items
+        self.journal = journal
+        self.dry_run = dry_run
+        # a sample is only part of the watchlist, so it's diffed against its own
+        # rows; diffing it against the whole database would archive the rest
+        self.sampled = sampled
 
-    def update_them_shits(self) -> None:
-        all_existing_movies = self.fetch_existing_movies()
-        existing_schedule_items = self.assemble_existing_movie_items(
-            all_existing_movies
-        )
+    def update_them_shits(self) -> WriteReport:
+        existing_movies = self.fetch_existing_movies()
 
-        delete_list, do_nothing_list, add_list = self.group_schedule_items(
-            existing_schedule_items, self.fresh_movie_items
-        )
-        self.operate_in_notion(delete_list, do_nothing_list, add_list)
+        diff = self.diff_movie_items(existing_movies, self.fresh_movie_items)
+        return self.operate_in_notion(diff)
 
-    @measure_execution(f"fetching existing movies")
-    def fetch_existing_movies(self):
-        return recursively_fetch_existing_notion_movies()
+    @metrics.stage("fetching existing movies")
+    def fetch_existing_movies(self) -> ExistingMovieIndex:
+        if self.sampled:
+            return index_existing_movies(
+                iter_existing_notion_movies_by_letterboxd_id(
+                    item.letterboxd_id for item in self.fresh_movie_items
+                )
+            )
+        return index_existing_movies(iter_existing_notion_movies())
 
-    def assemble_existing_movie_items(self, notion_rows: list[dict]):
+    def assemble_insertion_notion_props(
+        self, insertion_list: list[NotionMovieItem]
+    ) -> list[dict]:
+        return MOVIE_SCHEMA.encode_all(item.column_values() for item in insertion_list)
+
+    def diff_movie_items(
+        self,
+        existing_movies: ExistingMovieIndex,
+        fresh_items: list[NotionMovieItem],
+    ) -> MovieItemDiff:
+        # one sweep over the existing rows: whatever fresh item isn't claimed
+        # by a row along the way is an insert
+        unclaimed = {item.letterboxd_id: item for item in fresh_items}
+        diff = MovieItemDiff(list(existing_movies.duplicates), [], [], [])
+
+        for letterboxd_id, existing in existing_movies.by_letterboxd_id.items():
+            fresh = unclaimed.pop(letterboxd_id, None)
+            # rows for films that left the watchlist go away
+            if not fresh:
+                diff.delete_list.append(existing)
+                continue
+
+            changed = fresh.changed_notion_properties(existing.fingerprint)
+            if changed:
+                diff.update_list.append(MovieUpdate(existing.notion_id, changed))
+            else:
+                diff.do_nothing_list.append(existing)
+
+        diff.add_list.extend(unclaimed.values())
+        return diff
+
+    def delete_ops(self, delete_list: list[ExistingMovie]) -> list[WriteOp]:
+        return [archive_page_op(existing.notion_id) for existing in delete_list]
+
+    def update_ops(self, update_list: list[MovieUpdate]) -> list[WriteOp]:
         return [
-            NotionMovieItem.from_notion_interface(notion_item)
-            for notion_item in notion_rows
+            update_page_op(update.notion_id, update.properties)
+            for update in update_list
         ]
 
-    def assemble_insertion_notion_props(self, insertion_list: list[NotionMovieItem]):
+    def insert_ops(self, insert_list: list[NotionMovieItem]) -> list[WriteOp]:
+        insert_list_props = self.assemble_insertion_notion_props(insert_list)
         return [
-            notion.assemble_props(item.format_for_notion_interface())
-            for item in insertion_list
+            create_page_op(
+                MOVIE_DATABASE_ID,
+                props,
+                key=item.letterboxd_id,
+                dedupe_filter=letterboxd_id_filter(item.letterboxd_id),
+            )
+            for item, props in zip(insert_list, insert_list_props)
         ]
 
-    def group_schedule_items(
-        self,
-        existing_items: list[NotionMovieItem],
-        fresh_items: list[NotionMovieItem],
-    ) -> tuple[list[NotionMovieItem], list[NotionMovieItem], list[NotionMovieItem]]:
-        delete_list = list(set(existing_items) - set(fresh_items))
-        do_nothing_list = list(set(fresh_items) & set(existing_items))
-        add_list = list(set(fresh_items) - set(existing_items))
-
-        return (delete_list, do_nothing_list, add_list)
-
-    @measure_execution("deleting existing movies")
-    def delete_unuseful_movies(self, delete_list: list[NotionMovieItem]):
-        asyncio.run(
-            notion.async_delete_all_blocks(
-                [cast(str, item.notion_id) for item in delete_list]
+    async def write(self, ops: list[WriteOp]) -> WriteReport:
+        async with NotionWriter(get_notion().client.options.auth) as writer:
+            if not self.journal:
+                return await writer.run(ops)
+            # writes a crashed run already got acknowledged are skipped even
+            # if Notion's query index hasn't caught up with them yet
+            return await writer.run(
+                ops,
+                completed_keys=self.journal.completed_keys,
+                on_complete=self.journal.record_write,
             )
-        )
-        print(f"deleted {len(delete_list)} movies")
-
-    @measure_execution("inserting fresh movies")
-    def insert_new_movies(self, insert_list: list[NotionMovieItem]):
-        print([(item.title, item.location) for item in insert_list if item.location])
-        insert_list_props = self.assemble_insertion_notion_props(insert_list)
-        asyncio.run(notion.async_add_all_pages(MOVIE_DATABASE_ID, insert_list_props))
-        print(f"inserted {len(insert_list)} movies")
 
-    def operate_in_notion(
-        self,
-        delete_list: list[NotionMovieItem],
-        do_nothing_list: list[NotionMovieItem],
-        add_list: list[NotionMovieItem],
-    ):
-        self.delete_unuseful_movies(delete_list)
-        print(f"keeping {len(do_nothing_list)} movies\n")
-        self.insert_new_movies(add_list)
+    @metrics.stage("writing changes to notion")
+    def operate_in_notion(self, diff: MovieItemDiff) -> WriteReport:
+        print(
+            f"deleting {len(diff.delete_list)}, updating {len(diff.update_list)}, "
+            f"keeping {len(diff.do_nothing_list)}, inserting {len(diff.add_list)} movies"
+        )
+        ops = (
+            self.delete_ops(diff.delete_list)
+            + self.update_ops(diff.update_list)
+            + self.insert_ops(diff.add_list)
+        )
+        if self.dry_run:
+            print(f"dry run: skipping {len(ops)} notion writes")
+            return WriteReport()
+        report = asyncio.run(self.write(ops))
+        print(report.summary())
+        return report
@@ -0,0 +1,69 @@
+from types import ModuleType
+from typing import Any, Callable, Iterable, Optional
+import importlib
+import json
+
+orjson: Optional[ModuleType]
+try:
+    orjson = importlib.import_module("orjson")
+except ImportError:  # orjson is optional; the stdlib encoder is the fallback
+    orjson = None
+
+Encoder = Callable[[Any], dict]
+
+
+def encode_title(value: str) -> dict:
+    return {"title": [{"text": {"content": value}}]}
+
+
+def encode_rich_text(value: str) -> dict:
+    return {"rich_text": [{"text": {"content": value}}]}
+
+
+def encode_number(value: Optional[float]) -> dict:
+    return {"number": value}
+
+
+def encode_url(value: Optional[str]) -> dict:
+    return {"url": value}
+
+
+def encode_external_file(value: Optional[str]) -> dict:
+    if not value:
+        return {"files": []}
+    # Notion caps file names at 100 characters
+    return {
+        "files": [{"name": value[:100], "type": "external", "external": {"url": value}}]
+    }
+
+
+class PropertySchema:
+    # A per-column encoder table, built once. Rows are encoded straight from a
+    # tuple of column values into a Notion properties body, without the
+    # intermediate list of prop dicts that assemble_props works from.
+    def __init__(self, columns: Iterable[tuple[str, Encoder]]) -> None:
+        self.columns = tuple(columns)
+        self.names = tuple(name for name, _ in self.columns)
+
+    def encode(self, values: tuple) -> dict:
+        return {
+            name: encoder(value) for (name, encoder), value in zip(self.columns, values)
+        }
+
+    def encode_columns(self, values: tuple, indices: Iterable[int]) -> dict:
+        # a patch body holding only the given columns
+        properties = {}
+        for index in indices:
+            name, encoder = self.columns[index]
+            properties[name] = encoder(values[index])
+        return properties
+
+    def encode_all(self, rows: Iterable[tuple]) -> list[dict]:
+        encode = self.encode
+        return [encode(values) for values in rows]
+
+
+def dumps(body: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(body).decode()
+    return json.dumps(body, separators=(",", ":"))
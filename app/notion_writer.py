@@ -0,0 +1,258 @@
+from collections import Counter
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Callable, Iterable, NamedTuple, Optional
+import asyncio
+import random
+import time
+
+from metrics import metrics
+from notion_schema import dumps
+
+if TYPE_CHECKING:
+    from aiohttp import ClientResponse, ClientSession
+
+NOTION_API_URL = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+
+# Notion allows an average of three requests per second per integration
+NOTION_REQUESTS_PER_SECOND = 3.0
+NOTION_BURST = 3
+MAX_IN_FLIGHT = 3
+MAX_ATTEMPTS = 6
+BASE_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30.0
+TIMEOUT_SECONDS = 60.0
+
+
+class WriteOp(NamedTuple):
+    key: str
+    method: str
+    path: str
+    body: dict
+    # creates aren't idempotent, so after an ambiguous failure we look for
+    # the page with this filter before sending the create again
+    dedupe_filter: Optional[dict] = None
+
+
+def archive_page_op(page_id: str) -> WriteOp:
+    return WriteOp(
+        f"archive:{page_id}", "PATCH", f"/pages/{page_id}", {"archived": True}
+    )
+
+
+def update_page_op(page_id: str, properties: dict) -> WriteOp:
+    return WriteOp(
+        f"update:{page_id}:{','.join(sorted(properties))}",
+        "PATCH",
+        f"/pages/{page_id}",
+        {"properties": properties},
+    )
+
+
+def create_page_op(
+    database_id: str, properties: dict, key: str, dedupe_filter: Optional[dict] = None
+) -> WriteOp:
+    return WriteOp(
+        f"create:{key}",
+        "POST",
+        "/pages",
+        {"parent": {"database_id": database_id}, "properties": properties},
+        dedupe_filter,
+    )
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    async def take(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        # a 429 applies to the whole integration, so every writer backs off
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+def backoff_delay(attempt: int) -> float:
+    # "full jitter" so retried writes don't arrive in lockstep
+    return random.uniform(
+        0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** (attempt - 1))
+    )
+
+
+def retry_after_delay(response: "ClientResponse", attempt: int) -> float:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return backoff_delay(attempt)
+
+
+class WriteReport:
+    def __init__(self) -> None:
+        self.counts: Counter[str] = Counter()
+        self.completed_keys: list[str] = []
+        self.failed_keys: list[str] = []
+
+    def summary(self) -> str:
+        return (
+            f"notion writes: {self.counts['succeeded']} succeeded, "
+            f"{self.counts['retried']} retried, {self.counts['failed']} failed, "
+            f"{self.counts['skipped']} already done"
+        )
+
+
+class NotionWriter:
+    def __init__(
+        self,
+        token: str,
+        base_url: str = NOTION_API_URL,
+        requests_per_second: float = NOTION_REQUESTS_PER_SECOND,
+        max_attempts: int = MAX_ATTEMPTS,
+    ) -> None:
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.requests_per_second = requests_per_second
+        self.max_attempts = max_attempts
+        self.session: Optional["ClientSession"] = None
+        self.on_complete: Optional[Callable[[str], None]] = None
+
+    async def __aenter__(self) -> "NotionWriter":
+        from aiohttp import ClientSession, ClientTimeout
+
+        # created here so the bucket and semaphore bind to the running loop
+        self.bucket = TokenBucket(self.requests_per_second, NOTION_BURST)
+        self.semaphore = asyncio.Semaphore(MAX_IN_FLIGHT)
+        self.session = ClientSession(
+            headers={
+                "Authorization": f"Bearer {self.token}",
+                "Notion-Version": NOTION_VERSION,
+            },
+            timeout=ClientTimeout(total=TIMEOUT_SECONDS),
+            json_serialize=dumps,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self.session:
+            await self.session.close()
+        self.session = None
+
+    async def run(
+        self,
+        ops: Iterable[WriteOp],
+        completed_keys: Iterable[str] = (),
+        on_complete: Optional[Callable[[str], None]] = None,
+    ) -> WriteReport:
+        report = WriteReport()
+        self.on_complete = on_complete
+        done = set(completed_keys)
+        pending = []
+        for op in ops:
+            if op.key in done:
+                report.counts["skipped"] += 1
+            else:
+                pending.append(op)
+
+        await asyncio.gather(*[self.perform(op, report) for op in pending])
+        for outcome, count in report.counts.items():
+            metrics.count("notion_ops", count, outcome=outcome)
+        return report
+
+    async def perform(self, op: WriteOp, report: WriteReport) -> None:
+        async with self.semaphore:
+            for attempt in range(1, self.max_attempts + 1):
+                if attempt > 1:
+                    report.counts["retried"] += 1
+
+                outcome, delay = await self.attempt(op, attempt)
+                if outcome == "ambiguous" and op.dedupe_filter:
+                    # the create may have landed even though we never heard back
+                    if await self.already_applied(op):
+                        outcome = "succeeded"
+
+                if outcome == "succeeded":
+                    report.counts["succeeded"] += 1
+                    report.completed_keys.append(op.key)
+                    if self.on_complete:
+                        self.on_complete(op.key)
+                    return
+                if outcome == "rejected" or attempt == self.max_attempts:
+                    break
+                await asyncio.sleep(delay)
+
+        report.counts["failed"] += 1
+        report.failed_keys.append(op.key)
+
+    async def attempt(self, op: WriteOp, attempt: int) -> tuple[str, float]:
+        assert self.session, "use NotionWriter as `async with`"
+        await self.bucket.take()
+        with metrics.span(
+            "notion_request",
+            op=op.key.split(":", 1)[0],
+            method=op.method,
+            attempt=attempt,
+        ) as span:
+            outcome, delay = await self.send(op, attempt, span)
+            span["outcome"] = outcome
+            return outcome, delay
+
+    async def send(self, op: WriteOp, attempt: int, span: dict) -> tuple[str, float]:
+        assert self.session
+        from aiohttp import ClientError
+
+        try:
+            async with self.session.request(
+                op.method, f"{self.base_url}{op.path}", json=op.body
+            ) as response:
+                span["status"] = response.status
+                if response.status < HTTPStatus.MULTIPLE_CHOICES:
+                    return "succeeded", 0.0
+                if response.status == HTTPStatus.TOO_MANY_REQUESTS:
+                    delay = retry_after_delay(response, attempt)
+                    self.bucket.pause(delay)
+                    return "throttled", 0.0
+                if (
+                    response.status >= HTTPStatus.INTERNAL_SERVER_ERROR
+                    or response.status == HTTPStatus.CONFLICT
+                ):
+                    return "ambiguous", backoff_delay(attempt)
+                print(f"notion rejected {op.key}: {await response.text()}")
+                return "rejected", 0.0
+        except (ClientError, asyncio.TimeoutError) as error:
+            span["error"] = repr(error)
+            return "ambiguous", backoff_delay(attempt)
+
+    async def already_applied(self, op: WriteOp) -> bool:
+        assert self.session
+        from aiohttp import ClientError
+
+        database_id = op.body["parent"]["database_id"]
+        await self.bucket.take()
+        try:
+            async with self.session.post(
+                f"{self.base_url}/databases/{database_id}/query",
+                json={"filter": op.dedupe_filter, "page_size": 1},
+            ) as response:
+                if response.status >= HTTPStatus.MULTIPLE_CHOICES:
+                    return False
+                return bool((await response.json())["results"])
+        except (ClientError, asyncio.TimeoutError, ValueError):
+            return False
@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+import cProfile
+import io
+import pstats
+import re
+import tracemalloc
+
+DEFAULT_PROFILE_DIR = "data/profile"
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+
+# allocations made by tracemalloc itself and the import machinery are noise
+IGNORED_ALLOCATIONS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def stage_slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+class StageProfiler:
+    # cProfile only sees the thread that runs the stage: work handed to a
+    # process or thread pool shows up as time spent waiting on the pool
+    def __init__(self, directory: str = DEFAULT_PROFILE_DIR) -> None:
+        self.directory = Path(directory)
+        self.active = False
+
+    def start(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tracemalloc.start()
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+
+    @contextmanager
+    def profile(self, name: str, attrs: dict) -> Iterator[None]:
+        # a stage called from inside another is already in the outer profile
+        if self.active:
+            yield
+            return
+
+        self.active = True
+        profiler = cProfile.Profile()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            self.active = False
+
+            slug = stage_slug(name)
+            stats_path = self.directory / f"{slug}.prof"
+            report_path = self.directory / f"{slug}.txt"
+            profiler.dump_stats(stats_path)
+            report_path.write_text(report(name, profiler, before, after, peak))
+            attrs.update(profile=str(stats_path), peak_traced_bytes=peak)
+            print(f"{name} profile: {report_path}")
+
+
+def report(
+    name: str,
+    profiler: cProfile.Profile,
+    before: tracemalloc.Snapshot,
+    after: tracemalloc.Snapshot,
+    peak: int,
+) -> str:
+    out = io.StringIO()
+    out.write(f"{name}\npeak traced memory: {peak / 1_000_000:.1f} MB\n\n")
+    out.write("top functions by cumulative time\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+
+    out.write("top allocations still held at the end of the stage\n")
+    growth = after.filter_traces(IGNORED_ALLOCATIONS).compare_to(
+        before.filter_traces(IGNORED_ALLOCATIONS), "lineno"
+    )
+    for stat in growth[:TOP_ALLOCATIONS]:
+        out.write(f"{stat}\n")
+    return out.getvalue()
@@ -0,0 +1,86 @@
+from pathlib import Path
+from typing import Iterable, Optional, TextIO
+import json
+import os
+
+from assemblers.letterboxd_movie_assembler import NotionMovieItem
+
+DEFAULT_JOURNAL_PATH = "data/letterboxd_run.jsonl"
+
+
+class RunJournal:
+    # An append-only record of one sync: the scraped films first, then the
+    # key of every Notion write as Notion acknowledges it. A run that dies
+    # part way leaves the journal behind, so `--resume` can skip straight to
+    # the writes that are still missing; a clean run removes it.
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH) -> None:
+        self.path = Path(path)
+        self.items: Optional[list[NotionMovieItem]] = None
+        # a --limit run, which must be resumed as one too
+        self.sampled = False
+        self.completed_keys: set[str] = set()
+        self.file: Optional[TextIO] = None
+
+    def load(self) -> bool:
+        if not self.path.exists():
+            return False
+        with self.path.open() as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # a line torn by a crash mid-append
+                    continue
+                if entry["type"] == "scraped":
+                    self.items = [
+                        NotionMovieItem(**fields) for fields in entry["items"]
+                    ]
+                    self.sampled = entry.get("sampled", False)
+                elif entry["type"] == "write":
+                    self.completed_keys.add(entry["key"])
+        return self.items is not None
+
+    def start(self, items: Iterable[NotionMovieItem], sampled: bool = False) -> None:
+        self.items = list(items)
+        self.sampled = sampled
+        self.completed_keys = set()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = self.path.open("w")
+        self.append(
+            {
+                "type": "scraped",
+                "sampled": sampled,
+                "items": [item.as_dict() for item in self.items],
+            }
+        )
+
+    def reopen(self) -> None:
+        torn = False
+        with self.path.open("rb") as f:
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        self.file = self.path.open("a")
+        if torn:
+            # start on a fresh line so the torn entry doesn't swallow the next
+            self.file.write("\n")
+
+    def record_write(self, key: str) -> None:
+        self.completed_keys.add(key)
+        self.append({"type": "write", "key": key})
+
+    def append(self, entry: dict) -> None:
+        assert self.file, "start or reopen the journal before writing to it"
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        # each acknowledged write has to survive the crash we're guarding against
+        os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        if self.file:
+            self.file.close()
+        self.file = None
+
+    def finish(self) -> None:
+        self.close()
+        self.path.unlink(missing_ok=True)
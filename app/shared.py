@@ -1,16 +1,14 @@
-from shared_items.interfaces import Notion
-from shared_items.utils import pp, measure_execution
-
-notion = Notion()
+from shared_items.utils import pp
 
+from clients import get_notion
+from metrics import metrics
 
 MOVIE_DATABASE_ID = "33378c56ba7249b5ac88bf5f4753e7a2"
 
 
-@measure_execution("inserting to notion database")
+@metrics.stage("inserting to notion database")
 def insert_to_database(all_props: list[dict]):
-    total: int = len(all_props)
-    row_creator = notion.create_row_for_database(MOVIE_DATABASE_ID)
-    for idx, props in enumerate(all_props):
+    row_creator = get_notion().create_row_for_database(MOVIE_DATABASE_ID)
+    for done, props in enumerate(all_props, start=1):
         row_creator(props)
-        print(idx / total, end="\r", flush=True)
+        metrics.progress("notion inserts", done, len(all_props))
@@ -0,0 +1,109 @@
+from datetime import timedelta
+from typing import Iterable, Optional
+from pathlib import Path
+import os
+import time
+
+from pydantic import BaseModel
+
+from models.letterboxd import WatchOption
+
+DEFAULT_STATE_PATH = "data/letterboxd_state.json"
+
+AVAILABILITY_REFRESH = timedelta(hours=12)
+METADATA_REFRESH = timedelta(days=30)
+POSTER_REFRESH = timedelta(days=30)
+
+
+class FilmState(BaseModel):
+    attrs: Optional[dict] = None
+    poster_fetched_at: Optional[float] = None
+    watch_option: Optional[WatchOption] = None
+    availability_fetched_at: Optional[float] = None
+    runtime: Optional[str] = None
+    genres: list[str] = []
+    metadata_fetched_at: Optional[float] = None
+
+
+class SyncStateFile(BaseModel):
+    films: dict[str, FilmState] = {}
+
+
+def is_fresh(fetched_at: Optional[float], refresh: timedelta) -> bool:
+    return fetched_at is not None and time.time() - fetched_at < refresh.total_seconds()
+
+
+def load_state_file(path: Path) -> SyncStateFile:
+    try:
+        return SyncStateFile.parse_file(path)
+    except ValueError as error:
+        # state is only a cache of what was fetched; losing it costs a full
+        # refetch, which beats never starting again
+        print(f"ignoring unreadable sync state {path}: {error}")
+        return SyncStateFile()
+
+
+class SyncState:
+    def __init__(self, path: str = DEFAULT_STATE_PATH, load: bool = True) -> None:
+        self.path = Path(path)
+        state_file = (
+            load_state_file(self.path)
+            if load and self.path.exists()
+            else SyncStateFile()
+        )
+        self.films = state_file.films
+
+    def film(self, film_id: str) -> FilmState:
+        return self.films.setdefault(film_id, FilmState())
+
+    def fresh_poster_attrs(self, film_id: Optional[str]) -> Optional[dict]:
+        film = self.films.get(film_id) if film_id else None
+        if film and film.attrs and is_fresh(film.poster_fetched_at, POSTER_REFRESH):
+            return film.attrs
+        return None
+
+    def last_poster_attrs(self, film_id: Optional[str]) -> Optional[dict]:
+        film = self.films.get(film_id) if film_id else None
+        return film.attrs if film else None
+
+    def needs_availability(self, film_id: str) -> bool:
+        film = self.films.get(film_id)
+        return not film or not is_fresh(
+            film.availability_fetched_at, AVAILABILITY_REFRESH
+        )
+
+    def needs_metadata(self, film_id: str) -> bool:
+        film = self.films.get(film_id)
+        return not film or not is_fresh(film.metadata_fetched_at, METADATA_REFRESH)
+
+    def record_poster(self, attrs: dict) -> None:
+        film = self.film(attrs["data-film-id"])
+        film.attrs = attrs
+        film.poster_fetched_at = time.time()
+
+    def record_availability(
+        self, film_id: str, watch_option: Optional[WatchOption]
+    ) -> None:
+        film = self.film(film_id)
+        film.watch_option = watch_option
+        film.availability_fetched_at = time.time()
+
+    def record_metadata(self, film_id: str, runtime: str, genres: list[str]) -> None:
+        film = self.film(film_id)
+        film.runtime = runtime
+        film.genres = genres
+        film.metadata_fetched_at = time.time()
+
+    def prune(self, film_ids: Iterable[str]) -> None:
+        # films that left the watchlist shouldn't linger in the state file
+        keep = set(film_ids)
+        self.films = {
+            film_id: film for film_id, film in self.films.items() if film_id in keep
+        }
+
+    def save(self) -> None:
+        # written then renamed, so a run killed mid-save keeps the old state
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_name(self.path.name + ".tmp")
+        partial.write_text(SyncStateFile(films=self.films).json())
+        os.replace(partial, self.path)
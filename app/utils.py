@@ -1,22 +1,181 @@
-from aiohttp import ClientSession
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Optional, cast
 import asyncio
+import json
+import threading
+import time
 
+from urllib.parse import urlsplit
 
-async def async_aiohttp_get_all_text(urls):
-    async with ClientSession() as session:
+from http_cache import CachedResponse, HttpCache
+from metrics import metrics
 
-        async def fetch(url):
-            async with session.get(url) as response:
-                return await response.text()
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
 
-        return await asyncio.gather(*[fetch(url) for url in urls])
+DEFAULT_CONCURRENCY = 20
+DEFAULT_LIMIT_PER_HOST = 10
+DEFAULT_REQUESTS_PER_SECOND = 25.0
+DEFAULT_TIMEOUT_SECONDS = 30.0
+KEEPALIVE_TIMEOUT_SECONDS = 30.0
 
 
-async def async_aiohttp_get_all_json(urls):
-    async with ClientSession() as session:
+class FetchResult(NamedTuple):
+    url: str
+    content: Any = None
+    error: Optional[BaseException] = None
 
-        async def fetch(url):
-            async with session.get(url) as response:
-                return await response.json(content_type="text/json")
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
-        return await asyncio.gather(*[fetch(url) for url in urls])
+
+class RateLimiter:
+    def __init__(self, requests_per_second: Optional[float]) -> None:
+        self.interval = 1 / requests_per_second if requests_per_second else 0.0
+        self.next_slot = 0.0
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        # claiming the slot never awaits, so coroutines can't race for it
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class ThreadRateLimiter:
+    def __init__(self, requests_per_second: Optional[float]) -> None:
+        self.interval = 1 / requests_per_second if requests_per_second else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def read_bytes(body: bytes) -> bytes:
+    # raw bodies are what the parse pool wants; they pickle without re-encoding
+    return body
+
+
+def read_text(body: bytes) -> str:
+    return body.decode("utf-8", errors="replace")
+
+
+def read_json(body: bytes) -> Any:
+    return json.loads(body)
+
+
+class Fetcher:
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        limit_per_host: int = DEFAULT_LIMIT_PER_HOST,
+        requests_per_second: Optional[float] = DEFAULT_REQUESTS_PER_SECOND,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        cookies: Optional[dict[str, str]] = None,
+        cache: Optional[HttpCache] = None,
+    ) -> None:
+        self.concurrency = concurrency
+        self.limit_per_host = limit_per_host
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.timeout = timeout
+        self.cookies = cookies
+        self.cache = cache
+        self.session: Optional["ClientSession"] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "Fetcher":
+        # aiohttp takes a few hundred ms to import, so only a real session pays
+        from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+        # asyncio primitives are created here so they bind to the running loop
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        connector = TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=KEEPALIVE_TIMEOUT_SECONDS,
+        )
+        self.session = ClientSession(
+            connector=connector,
+            cookies=self.cookies,
+            timeout=ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self.session:
+            await self.session.close()
+        self.session = None
+
+    async def fetch(
+        self, url: str, read: Callable[[bytes], Any], resource: Optional[str] = None
+    ) -> FetchResult:
+        assert self.session and self.semaphore, "use Fetcher as `async with`"
+        from aiohttp import ClientError
+
+        cached = self.cache.get(url) if self.cache and resource else None
+        if self.cache and cached and self.cache.is_fresh(cached, cast(str, resource)):
+            self.cache.record("hit")
+            return self.decode(url, cached.body, read)
+
+        async with self.semaphore:
+            await self.rate_limiter.wait()
+            try:
+                body = await self.download(url, resource, cached)
+            except (ClientError, asyncio.TimeoutError) as error:
+                return FetchResult(url, error=error)
+
+        return self.decode(url, body, read)
+
+    async def download(
+        self, url: str, resource: Optional[str], cached: Optional[CachedResponse]
+    ) -> bytes:
+        assert self.session
+        headers = (
+            self.cache.conditional_headers(cached) if self.cache and cached else {}
+        )
+        with metrics.span(
+            "http", host=urlsplit(url).hostname, resource=resource
+        ) as span:
+            async with self.session.get(url, headers=headers) as response:
+                span["status"] = response.status
+                if self.cache and cached and response.status == HTTPStatus.NOT_MODIFIED:
+                    self.cache.record("revalidated")
+                    self.cache.touch(url)
+                    return cached.body
+
+                response.raise_for_status()
+                body = await response.read()
+                span["bytes"] = len(body)
+                if self.cache and resource:
+                    self.cache.record("miss")
+                    self.cache.store(
+                        url,
+                        body,
+                        etag=response.headers.get("ETag"),
+                        last_modified=response.headers.get("Last-Modified"),
+                    )
+                return body
+
+    def decode(
+        self, url: str, body: bytes, read: Callable[[bytes], Any]
+    ) -> FetchResult:
+        try:
+            return FetchResult(url, read(body))
+        except ValueError as error:
+            return FetchResult(url, error=error)
+
+
+def report_failure(result: FetchResult) -> None:
+    print(f"failed to fetch {result.url}: {result.error!r}")
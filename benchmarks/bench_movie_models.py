@@ -0,0 +1,106 @@
+"""Compare full `Movie` validation against the slim `MovieSummary` projection.
+
+Run from the repo root: python benchmarks/bench_movie_models.py
+"""
+
+from pathlib import Path
+from typing import Callable
+import copy
+import json
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from constants import RELEVANT_STREAMING_SERVICES  # noqa: E402
+from models.models import Movie, MovieSummary, Provider, ProviderIndex  # noqa: E402
+
+EXAMPLE_PATH = Path(__file__).resolve().parent.parent / "example.json"
+PAYLOAD_COUNT = 500
+
+
+def title_payload() -> dict:
+    # example.json is a search hit; pad it out to the shape get_title returns
+    with open(EXAMPLE_PATH) as f:
+        payload = json.load(f)
+    payload.update(
+        backdrops=[
+            {"backdrop_url": f"/backdrop/{idx}/{{profile}}"} for idx in range(8)
+        ],
+        short_description="A coming-of-age story. " * 20,
+        original_title=payload["title"],
+        localized_release_date="2022-11-23",
+        clips=[
+            {"type": "trailer", "provider": "youtube", "external_id": f"clip{idx}"}
+            for idx in range(6)
+        ],
+        credits=[
+            {"role": "ACTOR", "character_name": f"Role {idx}", "person_id": idx}
+            for idx in range(60)
+        ],
+        external_ids=[{"provider": "imdb_latest", "external_id": "tt14208870"}],
+        upcoming=None,
+        genre_ids=[5, 18],
+        age_certification="PG-13",
+        runtime=151,
+        production_countries=["US"],
+        promoted_bundles=None,
+        permanent_audiences=["general"],
+    )
+    return payload
+
+
+def relevant_provider_index() -> ProviderIndex:
+    return ProviderIndex(
+        Provider(
+            addon_packages=None,
+            clear_name=service["clear_name"],
+            data={},
+            display_priority=idx,
+            icon_blur_hash="",
+            icon_url="",
+            id=idx,
+            monetization_types=None,
+            parent_packages=None,
+            priority=idx,
+            short_name=service["short_name"],
+            slug=service["short_name"],
+            technical_name=service["short_name"],
+        )
+        for idx, service in enumerate(RELEVANT_STREAMING_SERVICES)
+    )
+
+
+def measure(build: Callable[..., object], payloads: list[dict]) -> dict:
+    provider_index = relevant_provider_index()
+    started = time.perf_counter()
+    models = [build(provider_index, **payload) for payload in payloads]
+    elapsed = time.perf_counter() - started
+    del models
+
+    # measured separately, since tracing allocations skews the timings
+    tracemalloc.start()
+    models = [build(provider_index, **payload) for payload in payloads]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del models
+    return {
+        "per_title_us": round(elapsed / len(payloads) * 1e6, 1),
+        "retained_kib": round(retained / 1024, 1),
+    }
+
+
+def main() -> None:
+    payload = title_payload()
+    payloads = [copy.deepcopy(payload) for _ in range(PAYLOAD_COUNT)]
+    results = {
+        "titles": PAYLOAD_COUNT,
+        "Movie": measure(Movie, payloads),
+        "MovieSummary": measure(MovieSummary, payloads),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
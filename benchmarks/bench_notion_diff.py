@@ -0,0 +1,149 @@
+"""Compare the old set-based Notion diff against the fingerprint index.
+
+"before" rebuilds the pydantic dataclass the diff used to run on, with its
+dict-copying __hash__, and groups items with three set expressions.
+"after" projects rows with index_existing_movies and partitions them with
+NotionRepo.diff_movie_items.
+
+Run from the repo root: python benchmarks/bench_notion_diff.py
+"""
+
+from pathlib import Path
+from typing import Callable, Optional
+import gc
+import json
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from pydantic.dataclasses import dataclass  # noqa: E402
+
+from assemblers.letterboxd_movie_assembler import NotionMovieItem  # noqa: E402
+from notion_repository import NotionRepo, index_existing_movies  # noqa: E402
+
+ITEM_COUNT = 50_000
+ROUNDS = 3
+
+
+@dataclass
+class BaselineMovieItem:
+    title: str
+    runtime: str
+    location: str
+    year: int
+    letterboxd_id: str
+    letterboxd_link: str
+    poster_url: str
+    notion_id: Optional[str] = None
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, BaselineMovieItem):
+            return self.__hash__() == other.__hash__()
+        else:
+            return False
+
+    def __hash__(self):
+        dicted = {**self.__dict__}
+        dicted.pop("notion_id", None)
+        return hash(tuple(sorted(dicted.items())))
+
+
+def baseline_diff(existing_items: list, fresh_items: list) -> tuple:
+    delete_list = list(set(existing_items) - set(fresh_items))
+    do_nothing_list = list(set(fresh_items) & set(existing_items))
+    add_list = list(set(fresh_items) - set(existing_items))
+    return (delete_list, do_nothing_list, add_list)
+
+
+def fields(idx: int, location: str = "Netflix") -> dict:
+    return {
+        "title": f"Film {idx}",
+        "runtime": f"1:{idx % 60:02}",
+        "location": location,
+        "year": 1950 + idx % 70,
+        "letterboxd_id": str(100_000 + idx),
+        "letterboxd_link": f"https://letterboxd.com/film/film-{idx}/",
+        "poster_url": f"https://a.ltrbxd.com/resized/film-poster/{idx}-film-{idx}.jpg",
+    }
+
+
+def notion_row(idx: int) -> dict:
+    values = fields(idx)
+
+    def text(value: str) -> list[dict]:
+        return [{"plain_text": value}]
+
+    return {
+        "id": f"page-{idx}",
+        "properties": {
+            "Title": {"title": text(values["title"])},
+            "Year": {"number": values["year"]},
+            "Runtime": {"rich_text": text(values["runtime"])},
+            "Location": {"rich_text": text(values["location"])},
+            "Letterboxd ID": {"rich_text": text(values["letterboxd_id"])},
+            "Letterboxd Link": {"url": values["letterboxd_link"]},
+            "Poster": {"files": [{"external": {"url": values["poster_url"]}}]},
+        },
+    }
+
+
+def fresh_fields() -> list[dict]:
+    # a watchlist that kept 90% of the rows, changed a tenth of those, and
+    # gained 10% new films
+    kept = int(ITEM_COUNT * 0.9)
+    return [
+        fields(idx, location="Rent $3.99" if idx % 10 == 0 else "Netflix")
+        for idx in range(kept)
+    ] + [fields(idx) for idx in range(ITEM_COUNT, ITEM_COUNT + ITEM_COUNT // 10)]
+
+
+def best_of(run: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    rows = [notion_row(idx) for idx in range(ITEM_COUNT)]
+    fresh = fresh_fields()
+
+    baseline_existing = [
+        BaselineMovieItem(**fields(idx), notion_id=f"page-{idx}")
+        for idx in range(ITEM_COUNT)
+    ]
+    baseline_fresh = [BaselineMovieItem(**values) for values in fresh]
+    existing_index = index_existing_movies(rows)
+    fresh_items = [NotionMovieItem(**values) for values in fresh]
+    repo = NotionRepo(fresh_items)
+
+    results = {
+        "existing_rows": ITEM_COUNT,
+        "fresh_items": len(fresh),
+        "before": {
+            "build_fresh_s": round(
+                best_of(lambda: [BaselineMovieItem(**values) for values in fresh]), 3
+            ),
+            "diff_s": round(
+                best_of(lambda: baseline_diff(baseline_existing, baseline_fresh)), 3
+            ),
+        },
+        "after": {
+            "build_fresh_s": round(
+                best_of(lambda: [NotionMovieItem(**values) for values in fresh]), 3
+            ),
+            "index_existing_s": round(best_of(lambda: index_existing_movies(rows)), 3),
+            "diff_s": round(
+                best_of(lambda: repo.diff_movie_items(existing_index, fresh_items)), 3
+            ),
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Offline benchmarks for every stage of the Letterboxd -> Notion sync.
+
+Letterboxd and Notion are both served by benchmarks/fixture_server.py, and
+JustWatch payloads come from example.json, so nothing leaves the machine.
+Each stage reports throughput plus p50/p95 latency per unit of work, and the
+whole run is printed (and optionally written) as JSON so two commits can be
+compared.
+
+Run from the repo root: python benchmarks/bench_pipeline.py [--sizes 100 1000]
+"""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Iterable, Optional
+import argparse
+import asyncio
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from assemblers.letterboxd_movie_assembler import (  # noqa: E402
+    Assembler as LetterBoxdMovieAssembler,
+    MOVIE_SCHEMA,
+    NotionMovieItem,
+)
+from extractors import DEFAULT_BACKEND, EXTRACTORS, ParsePool, ParseStage  # noqa: E402
+from models.letterboxd import LetterboxdJustwatchResult, LetterboxdMovie  # noqa: E402
+from models.models import MovieSummary  # noqa: E402
+from notion_repository import NotionRepo, index_existing_movies  # noqa: E402
+from notion_writer import NotionWriter, WriteOp  # noqa: E402
+from sync_state import SyncState  # noqa: E402
+from utils import Fetcher  # noqa: E402
+import letterboxd  # noqa: E402
+
+from bench_movie_models import relevant_provider_index, title_payload  # noqa: E402
+from fixture_server import (
+    WATCHLIST_PATH,
+    FixtureServer,
+    readable_properties,
+)  # noqa: E402
+
+DEFAULT_SIZES = [100, 1_000, 10_000]
+DIFF_ROUNDS = 5
+
+
+def percentile(ordered: list[float], percent: float) -> float:
+    # nearest-rank, which is exact for the small samples some stages have
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: list[float], items: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "items": items,
+        "seconds": round(elapsed, 4),
+        "throughput_per_s": round(items / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(ordered, 50) * 1e3, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1e3, 3),
+    }
+
+
+def time_each(run: Callable[[Any], object], inputs: Iterable[Any]) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for value in inputs:
+        call_started = time.perf_counter()
+        run(value)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, len(latencies), time.perf_counter() - started)
+
+
+class TimedFetcher(Fetcher):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.latencies: list[float] = []
+
+    async def download(self, url, resource, cached):
+        # timed inside the concurrency cap, so queueing isn't counted
+        started = time.perf_counter()
+        body = await super().download(url, resource, cached)
+        self.latencies.append(time.perf_counter() - started)
+        return body
+
+
+class TimedNotionWriter(NotionWriter):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.latencies: list[float] = []
+
+    async def attempt(self, op: WriteOp, attempt: int) -> tuple[str, float]:
+        started = time.perf_counter()
+        outcome = await super().attempt(op, attempt)
+        self.latencies.append(time.perf_counter() - started)
+        return outcome
+
+
+async def bench_scrape(
+    server: FixtureServer, parse_pool: ParsePool, state_dir: str
+) -> tuple[dict, list[NotionMovieItem]]:
+    letterboxd.LETTERBOXD_BASE_URL = server.base_url
+    letterboxd.LETTERBOXD_LIST_URL = f"{server.base_url}{WATCHLIST_PATH}"
+    state = SyncState(path=f"{state_dir}/state.json", load=False)
+
+    started = time.perf_counter()
+    async with TimedFetcher(requests_per_second=None) as fetcher:
+        async with ParseStage(fetcher, parse_pool) as parse_stage:
+            items = await letterboxd.LetterboxdScraper(parse_stage, state).movie_items()
+    elapsed = time.perf_counter() - started
+
+    # throughput is films per second; latency is per HTTP request
+    stats = summarize(fetcher.latencies, len(items), elapsed)
+    stats["requests"] = len(fetcher.latencies)
+    return stats, items
+
+
+def bench_parse(server: FixtureServer) -> dict:
+    extractor = EXTRACTORS[DEFAULT_BACKEND]
+    film_pages = [server.render_film_page(film).encode() for film in server.films]
+    posters = [server.render_poster(film).encode() for film in server.films]
+    list_pages = [
+        server.render_watchlist_page(page).encode()
+        for page in range(1, server.page_count + 1)
+    ]
+    return {
+        "backend": DEFAULT_BACKEND,
+        "film_page": time_each(extractor.film_page, film_pages),
+        "poster": time_each(extractor.poster, posters),
+        "list_page": time_each(extractor.list_page, list_pages),
+    }
+
+
+def bench_validation(server: FixtureServer) -> tuple[dict, list[LetterboxdMovie]]:
+    extractor = EXTRACTORS[DEFAULT_BACKEND]
+    film_attrs = [extractor.poster(server.render_poster(film)) for film in server.films]
+    availability = json.loads(server.availability)
+    provider_index = relevant_provider_index()
+    payload = title_payload()
+
+    movies: list[LetterboxdMovie] = []
+    stats = {
+        "letterboxd_movie": time_each(
+            lambda attrs: movies.append(LetterboxdMovie(**attrs)), film_attrs
+        ),
+        "availability": time_each(
+            lambda body: LetterboxdJustwatchResult(**body).best_option(),
+            [availability] * len(server.films),
+        ),
+        "justwatch_title": time_each(
+            lambda body: MovieSummary(provider_index, **body),
+            [payload] * len(server.films),
+        ),
+    }
+    return stats, movies
+
+
+def bench_assembly(movies: list[LetterboxdMovie]) -> dict:
+    return {
+        "notion_movie_item": time_each(
+            lambda movie: LetterBoxdMovieAssembler(movie).notion_movie_item(), movies
+        ),
+        "notion_properties": time_each(
+            lambda movie: MOVIE_SCHEMA.encode(
+                LetterBoxdMovieAssembler(movie).notion_movie_item().column_values()
+            ),
+            movies,
+        ),
+    }
+
+
+def bench_diff(items: list[NotionMovieItem]) -> dict:
+    # a later run where a tenth of the films changed location
+    rows = [
+        {
+            "id": f"page-{idx}",
+            "properties": readable_properties(item.notion_properties()),
+        }
+        for idx, item in enumerate(items)
+    ]
+    fresh = [
+        (
+            NotionMovieItem(**{**item.as_dict(), "location": "Rent $3.99"})
+            if idx % 10 == 0
+            else item
+        )
+        for idx, item in enumerate(items)
+    ]
+    repo = NotionRepo(fresh)
+
+    latencies = []
+    for _ in range(DIFF_ROUNDS):
+        started = time.perf_counter()
+        repo.diff_movie_items(index_existing_movies(rows), fresh)
+        latencies.append(time.perf_counter() - started)
+    # throughput is rows diffed per second over the median round
+    stats = summarize(latencies, len(rows), sorted(latencies)[len(latencies) // 2])
+    stats["rounds"] = DIFF_ROUNDS
+    return stats
+
+
+async def bench_notion_write(
+    server: FixtureServer, items: list[NotionMovieItem]
+) -> dict:
+    ops = NotionRepo(items).insert_ops(items)
+    started = time.perf_counter()
+    # the real 3 req/s limit would only measure the limiter, so it's lifted
+    async with TimedNotionWriter(
+        "fixture-token", base_url=f"{server.base_url}/v1", requests_per_second=1e6
+    ) as writer:
+        report = await writer.run(ops)
+    elapsed = time.perf_counter() - started
+    stats = summarize(writer.latencies, len(ops), elapsed)
+    stats["failed"] = report.counts["failed"]
+    return stats
+
+
+async def bench_size(film_count: int, parse_workers: Optional[int]) -> dict:
+    results: dict[str, Any] = {}
+    with TemporaryDirectory() as state_dir, ParsePool(workers=parse_workers) as pool:
+        async with FixtureServer(film_count) as server:
+            results["scrape"], items = await bench_scrape(server, pool, state_dir)
+            results["parse"] = bench_parse(server)
+            results["validation"], movies = bench_validation(server)
+            results["assembly"] = bench_assembly(movies)
+            results["diff"] = bench_diff(items)
+            results["notion_write"] = await bench_notion_write(server, items)
+    return results
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--output", help="also write the JSON results here")
+    args = parser.parse_args(argv)
+
+    results = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "sizes": {
+            str(size): asyncio.run(bench_size(size, args.parse_workers))
+            for size in args.sizes
+        },
+    }
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""A local stand-in for Letterboxd and the Notion API, serving the templates
+under benchmarks/fixtures for a synthetic watchlist of any size."""
+
+from pathlib import Path
+from string import Template
+from typing import Optional
+import json
+import uuid
+
+from aiohttp import web
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+FILMS_PER_PAGE = 28
+FIRST_FILM_ID = 51568
+WATCHLIST_PATH = "/markreckard/watchlist"
+
+
+def template(name: str) -> Template:
+    return Template((FIXTURES / name).read_text())
+
+
+class FixtureFilm:
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.film_id = str(FIRST_FILM_ID + index)
+        self.slug = f"fixture-film-{index}"
+        self.name = f"Fixture Film {index}"
+        self.year = 1950 + index % 74
+        self.cache_key = f"{index:08x}"
+
+    def fields(self) -> dict:
+        return {
+            "film_id": self.film_id,
+            "sharded_id": "/".join(self.film_id),
+            "slug": self.slug,
+            "name": self.name,
+            "year": self.year,
+            "cache_key": self.cache_key,
+            # every third list item lacks the year, as real list pages
+            # sometimes do, so the poster fragment fallback gets exercised
+            "year_attr": (
+                "" if self.index % 3 == 0 else f' data-film-release-year="{self.year}"'
+            ),
+            "runtime": 80 + self.index % 90,
+        }
+
+
+class FixtureServer:
+    def __init__(self, film_count: int) -> None:
+        self.films = [FixtureFilm(index) for index in range(film_count)]
+        self.by_slug = {film.slug: film for film in self.films}
+        self.by_id = {film.film_id: film for film in self.films}
+        self.page_count = max(1, -(-film_count // FILMS_PER_PAGE))
+        self.templates = {
+            name: template(f"{name}.html")
+            for name in ["watchlist_page", "watchlist_item", "poster", "film_page"]
+        }
+        self.availability = (FIXTURES / "availability.json").read_bytes()
+        # padding that gives film pages a realistic amount of markup (~40 KiB)
+        self.film_page_padding = {
+            "synopsis": "A sprawling, patient portrait of a family. " * 20,
+            "cast": "".join(
+                f'<a href="/actor/actor-{idx}/" class="text-slug tooltip" '
+                f'data-original-title="Role {idx}">Actor {idx}</a> '
+                for idx in range(120)
+            ),
+            "crew": "".join(
+                f'<h3><span>Role {idx}</span></h3><div class="text-sluglist">'
+                f'<p><a href="/crew/crew-{idx}/" class="text-slug">Crew {idx}</a></p></div>'
+                for idx in range(60)
+            ),
+            "reviews": "".join(
+                f'<div class="film-detail"><p>Review {idx}: '
+                + "Beautifully shot and acted. " * 12
+                + "</p></div>"
+                for idx in range(40)
+            ),
+        }
+        self.notion_pages: dict[str, dict] = {}
+        self.runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    async def __aenter__(self) -> "FixtureServer":
+        app = web.Application()
+        app.router.add_get(f"{WATCHLIST_PATH}/", self.watchlist_page)
+        app.router.add_get(f"{WATCHLIST_PATH}/page/{{page}}/", self.watchlist_page)
+        app.router.add_get("/ajax/poster/film/{slug}/std/125x187/", self.poster)
+        app.router.add_get("/film/{slug}/", self.film_page)
+        app.router.add_get("/s/film-availability", self.film_availability)
+        app.router.add_post("/v1/pages", self.notion_create)
+        app.router.add_patch("/v1/pages/{page_id}", self.notion_update)
+        app.router.add_post("/v1/databases/{database_id}/query", self.notion_query)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self.runner:
+            await self.runner.cleanup()
+
+    def html(self, body: str) -> web.Response:
+        return web.Response(text=body, content_type="text/html")
+
+    def render_watchlist_page(self, page: int) -> str:
+        films = self.films[(page - 1) * FILMS_PER_PAGE : page * FILMS_PER_PAGE]
+        items = "\n".join(
+            self.templates["watchlist_item"].substitute(film.fields()) for film in films
+        )
+        pages = "\n".join(
+            f'<li class="paginate-page"><a href="{WATCHLIST_PATH}/page/{idx}/">{idx}</a></li>'
+            for idx in range(1, self.page_count + 1)
+        )
+        return self.templates["watchlist_page"].substitute(
+            film_count=len(self.films), items=items, pages=pages
+        )
+
+    def render_poster(self, film: FixtureFilm) -> str:
+        return self.templates["poster"].substitute(film.fields())
+
+    def render_film_page(self, film: FixtureFilm) -> str:
+        return self.templates["film_page"].substitute(
+            film.fields(), **self.film_page_padding
+        )
+
+    async def watchlist_page(self, request: web.Request) -> web.Response:
+        return self.html(
+            self.render_watchlist_page(int(request.match_info.get("page", 1)))
+        )
+
+    async def poster(self, request: web.Request) -> web.Response:
+        return self.html(self.render_poster(self.by_slug[request.match_info["slug"]]))
+
+    async def film_page(self, request: web.Request) -> web.Response:
+        return self.html(
+            self.render_film_page(self.by_slug[request.match_info["slug"]])
+        )
+
+    async def film_availability(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.availability, content_type="application/json")
+
+    async def notion_create(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        page_id = str(uuid.uuid4())
+        self.notion_pages[page_id] = {
+            "id": page_id,
+            "properties": readable_properties(body["properties"]),
+        }
+        return web.json_response({"id": page_id})
+
+    async def notion_update(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        page_id = request.match_info["page_id"]
+        if body.get("archived"):
+            self.notion_pages.pop(page_id, None)
+        else:
+            self.notion_pages[page_id]["properties"].update(
+                readable_properties(body.get("properties", {}))
+            )
+        return web.json_response({"id": page_id})
+
+    async def notion_query(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        rows = list(self.notion_pages.values())
+        start = int(body.get("start_cursor") or 0)
+        end = start + body.get("page_size", 100)
+        return web.json_response(
+            {
+                "results": rows[start:end],
+                "has_more": end < len(rows),
+                "next_cursor": str(end) if end < len(rows) else None,
+            }
+        )
+
+
+def readable_properties(properties: dict) -> dict:
+    # Notion answers reads with plain_text alongside what was written
+    readable = json.loads(json.dumps(properties))
+    for value in readable.values():
+        for key in ("title", "rich_text"):
+            for text in value.get(key, []):
+                text["plain_text"] = text["text"]["content"]
+    return readable
@@ -0,0 +1,105 @@
+import json
+
+from assemblers.movie_assembler import MovieAssembler
+from models.models import Movie, MovieSummary, ProviderCollection
+
+
+def provider(short_name: str, clear_name: str) -> dict:
+    return {
+        "addon_packages": None,
+        "clear_name": clear_name,
+        "data": {},
+        "display_priority": 1,
+        "icon_blur_hash": "",
+        "icon_url": "",
+        "id": 1,
+        "monetization_types": None,
+        "parent_packages": None,
+        "priority": 1,
+        "short_name": short_name,
+        "slug": short_name,
+        "technical_name": short_name,
+    }
+
+
+def movie_payload(**overrides) -> dict:
+    with open("example.json") as f:
+        payload = json.load(f)
+    payload.update(
+        backdrops=[],
+        short_description="",
+        original_title=payload["title"],
+        clips=[],
+        credits=[],
+        external_ids=[],
+        genre_ids=[],
+        runtime=151,
+        production_countries=[],
+        **overrides,
+    )
+    return payload
+
+
+def offer(short_name: str, monetization_type: str, price=None) -> dict:
+    return {
+        "country": "US",
+        "currency": "USD",
+        "jw_entity_id": "tm1",
+        "monetization_type": monetization_type,
+        "package_short_name": short_name,
+        "presentation_type": "hd",
+        "provider_id": 1,
+        "urls": {},
+        "retail_price": price,
+    }
+
+
+def test_relevant_provider_index_keeps_only_configured_services():
+    collection = ProviderCollection(
+        providers=[provider("nfx", "Netflix"), provider("xyz", "Nobody Streams")]
+    )
+
+    index = collection.relevant_provider_index()
+
+    assert "nfx" in index
+    assert "xyz" not in index
+    assert index["nfx"].clear_name == "Netflix"
+
+
+def test_best_offer_prefers_streaming_on_a_relevant_provider():
+    index = ProviderCollection(
+        providers=[provider("nfx", "Netflix"), provider("itu", "Apple iTunes")]
+    ).relevant_provider_index()
+    movie = Movie(
+        index,
+        **movie_payload(
+            offers=[
+                offer("itu", "rent", 3.99),
+                offer("xyz", "flatrate"),
+                offer("nfx", "flatrate"),
+            ]
+        ),
+    )
+
+    assert [o.package_short_name for o in movie.relevant_offers()] == ["nfx", "itu"]
+    assert movie.best_offer.human_text == "Netflix"
+    assert movie.sorted_relevant_offers() is movie.sorted_relevant_offers()
+
+
+def test_movie_summary_matches_movie_for_everything_the_assembler_reads():
+    index = ProviderCollection(
+        providers=[provider("nfx", "Netflix"), provider("itu", "Apple iTunes")]
+    ).relevant_provider_index()
+    payload = movie_payload(
+        offers=[offer("itu", "rent", 3.99), offer("xyz", "flatrate")]
+    )
+
+    movie = Movie(index, **payload)
+    summary = MovieSummary(index, **payload)
+
+    assert MovieAssembler(summary).notion_movie_item() == (
+        MovieAssembler(movie).notion_movie_item()
+    )
+    assert [o.package_short_name for o in summary.offers] == ["itu"]
+    assert summary.raw["credits"] == payload["credits"]
+    assert len(summary.raw["offers"]) == 2
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import models.letterboxd
+from constants import rank_streaming_services, streaming_priority
+from models.letterboxd import WatchOption, WatchOptionCollection
+
+
+def stream_collection(*names: str) -> WatchOptionCollection:
+    return WatchOptionCollection(
+        type="stream",
+        watch_options=[
+            WatchOption(name=name, format="hd", type="flatrate", price=None)
+            for name in names
+        ],
+    )
+
+
+def test_best_stream_option_keeps_price_order_when_nothing_is_ranked(monkeypatch):
+    monkeypatch.setattr(
+        models.letterboxd, "streaming_priority", lambda: rank_streaming_services([])
+    )
+
+    best = stream_collection("Nobody Streams", "Kanopy", "Netflix").best_option()
+
+    assert best and best.name == "Kanopy"
+
+
+def test_best_stream_option_follows_the_ranking(monkeypatch):
+    monkeypatch.setattr(
+        models.letterboxd,
+        "streaming_priority",
+        lambda: rank_streaming_services(["Hulu", "Netflix"]),
+    )
+
+    assert stream_collection("Kanopy", "Netflix", "Hulu").best_option().name == "Hulu"
+    assert stream_collection("Kanopy", "Netflix").best_option().name == "Netflix"
+    assert stream_collection("Nobody Streams").best_option() is None
+
+
+def test_ranking_rejects_services_that_are_not_configured():
+    with pytest.raises(ValueError, match="Netflx"):
+        rank_streaming_services(["Netflx", "Hulu"])
+
+
+def test_streaming_priority_reads_the_ranking_file(tmp_path):
+    path = tmp_path / "streaming_priority.json"
+    path.write_text(json.dumps(["Kanopy", "Netflix", "Kanopy"]))
+
+    priority = streaming_priority(str(path))
+
+    assert priority["Kanopy"] == 0
+    assert priority["Netflix"] == 1
+    assert priority["Hulu"] == 2
+    assert streaming_priority(str(tmp_path / "missing.json"))["Hulu"] == 0
@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+IMPORT_ENTRY_POINTS = """
+import sys
+import clients, letterboxd, movies_2023
+
+assert clients.get_notion.cache_info().currsize == 0
+assert clients.get_just_watch.cache_info().currsize == 0
+print(sorted(name for name in ("aiohttp", "bs4", "justwatch", "lxml") if name in sys.modules))
+"""
+
+
+def test_importing_the_entry_points_builds_no_clients():
+    # a fresh interpreter, since this test run has long since imported aiohttp
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_ENTRY_POINTS],
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "[]"
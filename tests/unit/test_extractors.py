@@ -0,0 +1,236 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from extractors import EXTRACTORS, FilmPageData, ListPage, ParsePool, ParseStage
+from utils import Fetcher
+
+LIST_PAGE = """
+<html><body>
+<ul class="poster-list">
+  <li><div class="really-lazy-load poster film-poster" data-film-id="101"
+      data-film-slug="/film/alpha/" data-cache-busting-key="abc">
+      <img src="empty.png" alt="Alpha" /></div></li>
+  <li><div class="film-poster really-lazy-load" data-film-id="102"
+      data-film-slug="/film/beta/" data-cache-busting-key="def"></div></li>
+</ul>
+<div class="pagination"><div class="paginate-pages"><ul>
+  <li class="paginate-page"><a href="/page/1/">1</a></li>
+  <li class="paginate-page unseen-pages">&hellip;</li>
+  <li class="paginate-page"><a href="/page/12/">12</a></li>
+</ul></div></div>
+</body></html>
+"""
+
+POSTER = """
+<div class="film-poster poster" data-film-id="101" data-film-name="Amélie"
+    data-film-release-year="2021" data-film-link="/film/alpha/">
+  <div><img src="a.jpg" srcset="https://a.ltrbxd.com/alpha-250.jpg 2x" /></div>
+</div>
+"""
+
+FILM_PAGE = """
+<html><body>
+<p class="text-link text-footer">112&nbsp;mins &nbsp; More at <a>IMDb</a></p>
+<div id="tab-genres"><h3>Genres</h3>
+  <div class="text-sluglist"><a>Drama</a> <a>Thriller</a></div>
+  <div class="text-sluglist"><a>ignored</a></div>
+</div>
+</body></html>
+"""
+
+BACKENDS = sorted(EXTRACTORS)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_list_page(backend):
+    page = EXTRACTORS[backend].list_page(LIST_PAGE)
+
+    assert page == ListPage(
+        [
+            {
+                "data-film-id": "101",
+                "data-film-slug": "/film/alpha/",
+                "data-cache-busting-key": "abc",
+                "data-film-name": "Alpha",
+            },
+            {
+                "data-film-id": "102",
+                "data-film-slug": "/film/beta/",
+                "data-cache-busting-key": "def",
+            },
+        ],
+        12,
+    )
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_poster(backend):
+    assert EXTRACTORS[backend].poster(POSTER.encode()) == {
+        "data-film-id": "101",
+        "data-film-name": "Amélie",
+        "data-film-release-year": "2021",
+        "data-film-link": "/film/alpha/",
+        "poster_url": "https://a.ltrbxd.com/alpha-250.jpg",
+    }
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_poster_missing_attrs(backend):
+    assert EXTRACTORS[backend].poster('<div class="poster" data-film-id="1">') is None
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_film_page(backend):
+    assert EXTRACTORS[backend].film_page(FILM_PAGE) == FilmPageData(
+        "112", ["Drama", "Thriller"]
+    )
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_film_page_without_runtime_or_genres(backend):
+    assert EXTRACTORS[backend].film_page("<html><body></body></html>") == (
+        FilmPageData("", [])
+    )
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("html", ["", b"", "  \n"])
+def test_empty_document(backend, html):
+    extractor = EXTRACTORS[backend]
+
+    assert extractor.list_page(html) == ListPage([], 1)
+    assert extractor.poster(html) is None
+    assert extractor.film_page(html) == FilmPageData("", [])
+
+
+async def test_parse_pool_matches_inline_parsing():
+    with ParsePool("stream", workers=1) as pool:
+        assert await pool.film_page(FILM_PAGE) == FilmPageData(
+            "112", ["Drama", "Thriller"]
+        )
+    with ParsePool("stream", workers=0) as pool:
+        assert (await pool.list_page(LIST_PAGE)).page_count == 12
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        ParsePool("regex")
+
+
+async def test_parse_stage_overlaps_downloads_with_bounded_backlog():
+    async def handler(request: web.Request) -> web.Response:
+        return web.Response(body=FILM_PAGE.encode())
+
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    server = TestServer(app)
+    await server.start_server()
+    urls = [str(server.make_url(f"/{idx}")) for idx in range(30)]
+
+    # bodies downloaded but not yet parsed is what backpressure has to bound
+    held = 0
+    peak = 0
+    downloaded = 0
+    # how many downloads had finished when each parse started
+    downloaded_at_parse: list[int] = []
+
+    class CountingFetcher(Fetcher):
+        async def fetch(self, url, read, resource=None):
+            nonlocal held, peak, downloaded
+            result = await super().fetch(url, read, resource)
+            downloaded += 1
+            held += 1
+            peak = max(peak, held)
+            return result
+
+    class SlowPool(ParsePool):
+        async def run(self, kind, html):
+            nonlocal held
+            assert isinstance(html, bytes)
+            downloaded_at_parse.append(downloaded)
+            await asyncio.sleep(0.005)
+            held -= 1
+            return await super().run(kind, html)
+
+    with SlowPool("stream", workers=0) as pool:
+        async with CountingFetcher(concurrency=10, requests_per_second=None) as fetcher:
+            async with ParseStage(fetcher, pool, max_pending=2) as stage:
+                results = await asyncio.gather(
+                    *[stage.fetch(url, "film_page") for url in urls]
+                )
+    await server.close()
+
+    assert [result.content.runtime for result in results] == ["112"] * 30
+    assert peak <= stage.max_pending + stage.consumer_count
+    # parsing got going while most of the downloads were still to come
+    assert downloaded_at_parse[0] < len(urls) // 2
+
+
+async def test_parse_stage_reports_a_body_the_parser_rejects():
+    async def handler(request: web.Request) -> web.Response:
+        body = b"" if request.match_info["name"] == "empty" else FILM_PAGE.encode()
+        return web.Response(body=body)
+
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    server = TestServer(app)
+    await server.start_server()
+
+    class StrictPool(ParsePool):
+        # lxml, for one, refuses an empty document outright
+        async def run(self, kind, html):
+            if not html:
+                raise ValueError("Document is empty")
+            return await super().run(kind, html)
+
+    with StrictPool("stream", workers=0) as pool:
+        async with Fetcher(requests_per_second=None) as fetcher:
+            async with ParseStage(fetcher, pool) as stage:
+                empty, good = await asyncio.gather(
+                    stage.fetch(str(server.make_url("/empty")), "film_page"),
+                    stage.fetch(str(server.make_url("/good")), "film_page"),
+                )
+    await server.close()
+
+    assert not empty.ok
+    assert isinstance(empty.error, ValueError)
+    assert good.content == FilmPageData("112", ["Drama", "Thriller"])
+
+
+async def test_parse_stage_survives_a_cancelled_fetch():
+    async def handler(request: web.Request) -> web.Response:
+        return web.Response(body=FILM_PAGE.encode())
+
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    server = TestServer(app)
+    await server.start_server()
+    parsing = asyncio.Event()
+    release = asyncio.Event()
+
+    class GatedPool(ParsePool):
+        async def run(self, kind, html):
+            parsing.set()
+            await release.wait()
+            return await super().run(kind, html)
+
+    with GatedPool("stream", workers=0) as pool:
+        async with Fetcher(requests_per_second=None) as fetcher:
+            async with ParseStage(fetcher, pool) as stage:
+                abandoned = asyncio.create_task(
+                    stage.fetch(str(server.make_url("/abandoned")), "film_page")
+                )
+                await parsing.wait()
+                abandoned.cancel()
+                release.set()
+                # the only consumer has to outlive the fetch that gave up
+                result = await asyncio.wait_for(
+                    stage.fetch(str(server.make_url("/next")), "film_page"), 5
+                )
+    await server.close()
+
+    assert abandoned.cancelled()
+    assert result.content == FilmPageData("112", ["Drama", "Thriller"])
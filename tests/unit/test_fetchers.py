@@ -0,0 +1,126 @@
+import json
+
+from requests import RequestException
+
+import fetchers
+from fetchers import (
+    NotionTitleRow,
+    get_movies_from_just_watch,
+    load_known_just_watch_ids,
+    resolve_known_just_watch_ids,
+    title_key,
+)
+
+
+def search_item(title: str, id: int) -> dict:
+    return {
+        "title": title,
+        "full_path": f"/us/movie/{id}",
+        "full_paths": {},
+        "jw_entity_id": f"tm{id}",
+        "object_type": "movie",
+        "id": id,
+        "original_release_year": 2022,
+        "poster": None,
+        "poster_blur_hash": None,
+        "scoring": None,
+        "offers": None,
+    }
+
+
+class FakeJustWatch:
+    def __init__(
+        self,
+        search_items: dict[str, list[dict]],
+        titles: dict[int, dict],
+        failing: frozenset[int] = frozenset(),
+    ) -> None:
+        self.search_items = search_items
+        self.titles = titles
+        self.failing = failing
+        self.searches: list[str] = []
+
+    def search_for_item(self, query: str, **kwargs) -> dict:
+        self.searches.append(query)
+        return {"items": self.search_items.get(query, [])}
+
+    def get_title(self, title_id: int) -> dict:
+        if title_id in self.failing:
+            raise RequestException(f"503 for title {title_id}")
+        return self.titles[title_id]
+
+
+def test_title_key_ignores_case_and_punctuation():
+    assert title_key("The Matrix: Reloaded!") == title_key("the matrix reloaded")
+
+
+def test_known_ids_come_from_notion_first_then_movies_2023_json(tmp_path):
+    path = tmp_path / "movies_2023.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"title": "The Matrix: Reloaded!", "id": 7},
+                {"title": "Alpha", "id": 8},
+            ]
+        )
+    )
+    known_ids = load_known_just_watch_ids(str(path))
+    rows = {
+        "page-1": NotionTitleRow("Alpha", 99),
+        "page-2": NotionTitleRow("the matrix reloaded", None),
+        "page-3": NotionTitleRow("Unheard Of", None),
+    }
+
+    assert resolve_known_just_watch_ids(rows, known_ids) == {
+        "page-1": 99,
+        "page-2": 7,
+        "page-3": None,
+    }
+
+
+def test_titles_with_a_known_id_skip_the_search(monkeypatch):
+    client = FakeJustWatch(
+        search_items={"Unheard Of": [search_item("Unheard Of", 9)]},
+        titles={id: {"id": id} for id in (7, 8, 9)},
+    )
+    monkeypatch.setattr(fetchers, "get_just_watch", lambda: client)
+    rows = {
+        "page-1": NotionTitleRow("Alpha", 8),
+        "page-2": NotionTitleRow("The Matrix Reloaded", None),
+        "page-3": NotionTitleRow("Unheard Of", None),
+    }
+
+    movies = get_movies_from_just_watch(
+        rows, {title_key("The Matrix Reloaded"): 7}, requests_per_second=None
+    )
+
+    assert client.searches == ["Unheard Of"]
+    assert movies == {"page-1": {"id": 8}, "page-2": {"id": 7}, "page-3": {"id": 9}}
+
+
+def test_failed_and_missing_titles_dont_stop_the_others(monkeypatch, capsys):
+    client = FakeJustWatch(
+        search_items={
+            "Alpha": [search_item("Alpha Returns", 1), search_item("Alpha", 2)],
+            "Beta": [search_item("Beta", 3)],
+            "Nowhere": [],
+        },
+        titles={id: {"id": id} for id in range(1, 30)},
+        failing=frozenset({3}),
+    )
+    monkeypatch.setattr(fetchers, "get_just_watch", lambda: client)
+    rows = {
+        "page-alpha": NotionTitleRow("Alpha", None),
+        "page-beta": NotionTitleRow("Beta", None),
+        "page-nowhere": NotionTitleRow("Nowhere", None),
+        **{f"page-{id}": NotionTitleRow(f"Film {id}", id) for id in range(10, 30)},
+    }
+
+    movies = get_movies_from_just_watch(rows, {}, workers=4, requests_per_second=None)
+
+    # the exact-title match wins, and every known id is still fetched
+    assert movies["page-alpha"] == {"id": 2}
+    assert "page-beta" not in movies
+    assert "page-nowhere" not in movies
+    assert len(movies) == 21
+    assert "failed to fetch Beta from JustWatch" in capsys.readouterr().out
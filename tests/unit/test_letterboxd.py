@@ -0,0 +1,271 @@
+from typing import Optional
+
+import pytest
+
+from extractors import ListPage
+import letterboxd
+from constants import rank_streaming_services
+from letterboxd import (
+    LetterboxdScraper,
+    availability_url,
+    film_page_url,
+    list_item_attrs,
+    poster_ajax_url,
+    poster_image_url,
+    watchlist_page_url,
+)
+from models.letterboxd import LetterboxdMovie, WatchOption
+from sync_state import SyncState
+from utils import FetchResult
+
+LIST_ITEM = {
+    "data-film-id": "51568",
+    "data-film-slug": "/film/the-godfather/",
+    "data-target-link": "/film/the-godfather/",
+    "data-cache-busting-key": "bca8b674",
+    "data-film-name": "The Godfather",
+    "data-film-release-year": "1972",
+}
+
+
+def test_poster_image_url_shards_by_film_id_digits():
+    assert poster_image_url("51568", "/film/the-godfather/", "bca8b674") == (
+        "https://a.ltrbxd.com/resized/film-poster/5/1/5/6/8/"
+        "51568-the-godfather-0-250-0-375-crop.jpg?v=bca8b674"
+    )
+
+
+def test_list_item_attrs_match_the_poster_fragment():
+    assert list_item_attrs(LIST_ITEM) == {
+        "data-film-id": "51568",
+        "data-film-name": "The Godfather",
+        "data-film-release-year": "1972",
+        "data-film-link": "/film/the-godfather/",
+        "poster_url": poster_image_url("51568", "/film/the-godfather/", "bca8b674"),
+    }
+
+
+def test_list_item_attrs_fall_back_when_attributes_are_missing():
+    without_year = {
+        key: value
+        for key, value in LIST_ITEM.items()
+        if key != "data-film-release-year"
+    }
+    without_key = {
+        key: value
+        for key, value in LIST_ITEM.items()
+        if key != "data-cache-busting-key"
+    }
+
+    assert list_item_attrs(without_year) is None
+    assert list_item_attrs(without_key) is None
+
+
+class FakeParseStage:
+    # answers by url from `pages`; an exception there is a failed fetch
+    def __init__(self, pages: dict):
+        self.pages = pages
+        self.fetcher = self
+        self.requested: list[str] = []
+
+    async def fetch(self, url, kind, resource=None):
+        self.requested.append(url)
+        content = self.pages[url]
+        if isinstance(content, Exception):
+            return FetchResult(url, error=content)
+        return FetchResult(url, content)
+
+
+def ajax_only_item(film_id: str) -> dict:
+    # no year on the list page, so the poster fragment has to be fetched
+    return {
+        "data-film-id": film_id,
+        "data-film-slug": f"/film/{film_id}/",
+        "data-cache-busting-key": "k",
+    }
+
+
+def poster_fragment(film_id: str) -> dict:
+    return {
+        "data-film-id": film_id,
+        "data-film-name": f"Film {film_id}",
+        "data-film-release-year": "2001",
+        "data-film-link": f"/film/{film_id}/",
+        "poster_url": f"https://a.ltrbxd.com/{film_id}.jpg",
+    }
+
+
+def listed_item(film_id: str) -> dict:
+    # everything list_item_attrs needs, so no poster fragment is fetched
+    return {
+        **ajax_only_item(film_id),
+        "data-film-name": f"Film {film_id}",
+        "data-film-release-year": "2001",
+    }
+
+
+def watchlist(*pages: list[dict]) -> dict:
+    return {
+        watchlist_page_url(number): ListPage(items, len(pages))
+        for number, items in enumerate(pages, start=1)
+    }
+
+
+def scraper(
+    pages: dict, state: SyncState, limit: Optional[int] = None
+) -> LetterboxdScraper:
+    return LetterboxdScraper(FakeParseStage(pages), state, limit=limit)
+
+
+def film_ids(films: list[dict]) -> list[str]:
+    return [film["data-film-id"] for film in films]
+
+
+async def test_failed_poster_falls_back_to_stale_attrs(tmp_path):
+    item = ajax_only_item("1")
+    state = SyncState(str(tmp_path / "state.json"), load=False)
+    # recorded long enough ago that it would normally be refetched
+    state.record_poster(poster_fragment("1"))
+    state.film("1").poster_fetched_at = 0
+    pages = {poster_ajax_url(item): TimeoutError()}
+
+    films = await scraper(pages, state).find_movies_from_letterboxd_list_page([item])
+
+    assert films == [poster_fragment("1")]
+
+
+async def test_failed_poster_without_fallback_aborts(tmp_path):
+    # dropping the film instead would archive its notion row
+    item = ajax_only_item("1")
+    state = SyncState(str(tmp_path / "state.json"), load=False)
+    pages = {poster_ajax_url(item): TimeoutError()}
+
+    with pytest.raises(RuntimeError, match="could not fetch poster"):
+        await scraper(pages, state).find_movies_from_letterboxd_list_page([item])
+
+
+async def test_every_page_is_fetched_in_watchlist_order(tmp_path):
+    pages = watchlist(
+        [listed_item("1"), listed_item("2")],
+        [listed_item("3"), listed_item("4")],
+        [listed_item("5")],
+    )
+    letterboxd = scraper(pages, SyncState(str(tmp_path / "state.json"), load=False))
+
+    films = await letterboxd.fetch_all_movies_from_letterboxd()
+
+    assert film_ids(films) == ["1", "2", "3", "4", "5"]
+    assert sorted(letterboxd.parse_stage.requested) == sorted(pages)
+
+
+@pytest.mark.parametrize(
+    "limit, expected_ids, pages_fetched", [(1, ["1"], 1), (3, ["1", "2", "3"], 2)]
+)
+async def test_limit_samples_the_first_films(
+    tmp_path, limit, expected_ids, pages_fetched
+):
+    pages = watchlist(
+        [listed_item("1"), listed_item("2")],
+        [listed_item("3"), listed_item("4")],
+        [listed_item("5")],
+    )
+    letterboxd = scraper(
+        pages, SyncState(str(tmp_path / "state.json"), load=False), limit
+    )
+
+    films = await letterboxd.fetch_all_movies_from_letterboxd()
+
+    assert film_ids(films) == expected_ids
+    assert letterboxd.parse_stage.requested == [
+        watchlist_page_url(number) for number in range(1, pages_fetched + 1)
+    ]
+
+
+async def test_known_and_fetched_posters_keep_watchlist_order(tmp_path):
+    state = SyncState(str(tmp_path / "state.json"), load=False)
+    state.record_poster(poster_fragment("3"))
+    items = [
+        ajax_only_item("1"),
+        listed_item("2"),
+        ajax_only_item("3"),
+        ajax_only_item("4"),
+        listed_item("5"),
+    ]
+    pages = {
+        **watchlist(items),
+        poster_ajax_url(items[0]): poster_fragment("1"),
+        poster_ajax_url(items[3]): poster_fragment("4"),
+    }
+    letterboxd = scraper(pages, state)
+
+    films = await letterboxd.fetch_all_movies_from_letterboxd()
+
+    assert film_ids(films) == ["1", "2", "3", "4", "5"]
+    assert films[2] == poster_fragment("3")
+    assert poster_ajax_url(items[2]) not in letterboxd.parse_stage.requested
+
+
+async def test_fresh_state_skips_every_film_request(tmp_path):
+    # nothing but the watchlist page is in `pages`, so any other fetch fails
+    item = ajax_only_item("1")
+    state = SyncState(str(tmp_path / "state.json"), load=False)
+    state.record_poster(poster_fragment("1"))
+    state.record_availability("1", None)
+    state.record_metadata("1", "112", ["Drama"])
+    letterboxd = scraper(watchlist([item]), state)
+
+    (attrs,) = await letterboxd.fetch_all_movies_from_letterboxd()
+    movie = await letterboxd.fetch_film_details(LetterboxdMovie(**attrs))
+
+    assert letterboxd.parse_stage.requested == [watchlist_page_url(1)]
+    assert (movie.runtime, movie.genres) == ("112", ["Drama"])
+
+
+async def test_stale_state_refetches_film_details(tmp_path):
+    state = SyncState(str(tmp_path / "state.json"), load=False)
+    state.record_poster(poster_fragment("1"))
+    movie = LetterboxdMovie(**poster_fragment("1"))
+    pages = {
+        availability_url(movie): TimeoutError(),
+        film_page_url(movie): ("98", ["Comedy"]),
+    }
+    letterboxd = scraper(pages, state)
+
+    await letterboxd.fetch_film_details(movie)
+
+    assert sorted(letterboxd.parse_stage.requested) == sorted(pages)
+    assert (movie.runtime, movie.genres) == ("98", ["Comedy"])
+    assert not state.needs_metadata("1")
+    assert state.needs_availability("1")
+
+
+@pytest.mark.parametrize("body", [{}, {"best": {}}, ["not", "a", "dict"]])
+async def test_malformed_availability_keeps_the_last_option(tmp_path, capsys, body):
+    state = SyncState(str(tmp_path / "state.json"), load=False)
+    last_option = WatchOption(name="Kanopy", format="hd", type="free", price=None)
+    state.record_availability("1", last_option)
+    state.film("1").availability_fetched_at = 0
+    movie = LetterboxdMovie(**poster_fragment("1"))
+    letterboxd = scraper({availability_url(movie): body}, state)
+
+    await letterboxd.refresh_availability(movie)
+
+    assert movie.justwatch_watch_option == last_option
+    assert state.needs_availability("1")
+    assert f"failed to fetch {availability_url(movie)}" in capsys.readouterr().out
+
+
+def test_bad_streaming_priority_stops_the_run_before_scraping(monkeypatch, capsys):
+    def bad_priority():
+        return rank_streaming_services(["Netflx"])
+
+    def sync(*args):
+        raise AssertionError("scraped despite a bad ranking file")
+
+    monkeypatch.setattr(letterboxd, "streaming_priority", bad_priority)
+    monkeypatch.setattr(letterboxd, "sync", sync)
+
+    with pytest.raises(SystemExit):
+        letterboxd.main([])
+
+    assert "unknown streaming services: Netflx" in capsys.readouterr().err
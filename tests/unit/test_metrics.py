@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from metrics import Metrics
+
+
+def read_records(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_spans_are_written_as_they_finish(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    metrics = Metrics()
+    metrics.open(str(path))
+
+    with metrics.span("http", host="letterboxd.com") as span:
+        span["status"] = 200
+    with pytest.raises(ValueError):
+        with metrics.span("stage", stage="parse"):
+            raise ValueError("bad page")
+
+    spans = [record for record in read_records(path) if record["type"] == "span"]
+    assert [(span["name"], span.get("status")) for span in spans] == [
+        ("http", 200),
+        ("stage", None),
+    ]
+    assert spans[0]["host"] == "letterboxd.com"
+    assert spans[1]["error"] == "ValueError('bad page')"
+    assert {span["run"] for span in spans} == {metrics.run_id}
+    metrics.close()
+
+
+def test_counters_export_to_jsonl_and_prometheus(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    textfile = tmp_path / "movies.prom"
+    metrics = Metrics()
+    metrics.open(str(path))
+
+    metrics.count("http_cache", outcome="hit")
+    metrics.count("http_cache", outcome="hit")
+    metrics.count("notion_ops", 3, outcome="succeeded")
+    with metrics.span("http"):
+        pass
+    metrics.close(str(textfile))
+
+    counters = read_records(path)[-1]
+    assert counters["type"] == "counters"
+    assert {"name": "http_cache", "labels": {"outcome": "hit"}, "value": 2} in (
+        counters["counters"]
+    )
+    prometheus = textfile.read_text().splitlines()
+    assert 'movies_sync_http_cache_total{outcome="hit"} 2' in prometheus
+    assert 'movies_sync_notion_ops_total{outcome="succeeded"} 3' in prometheus
+    assert 'movies_sync_span_seconds_count{span="http"} 1' in prometheus
+
+
+def test_stage_records_a_span_and_returns_the_result(tmp_path, capsys):
+    path = tmp_path / "metrics.jsonl"
+    metrics = Metrics()
+    metrics.open(str(path))
+
+    @metrics.stage("fetching things")
+    def fetch_things() -> list[int]:
+        return [1, 2]
+
+    assert fetch_things() == [1, 2]
+    metrics.close()
+
+    assert capsys.readouterr().out.startswith("fetching things ")
+    assert any(
+        record.get("stage") == "fetching things" for record in read_records(path)
+    )
+
+
+def test_profiled_stage_writes_a_profile_and_allocation_report(tmp_path):
+    profile_dir = tmp_path / "profile"
+    metrics = Metrics()
+    metrics.open(str(tmp_path / "metrics.jsonl"), profile_dir=str(profile_dir))
+
+    @metrics.stage("Building rows")
+    def build_rows() -> list[dict]:
+        return [{"id": str(id)} for id in range(1000)]
+
+    build_rows()
+    metrics.close()
+
+    assert (profile_dir / "building_rows.prof").exists()
+    report = (profile_dir / "building_rows.txt").read_text()
+    assert "build_rows" in report
+    assert "top allocations" in report
+    [stage] = [
+        record
+        for record in read_records(tmp_path / "metrics.jsonl")
+        if record.get("stage") == "Building rows"
+    ]
+    assert stage["profile"] == str(profile_dir / "building_rows.prof")
+    assert stage["peak_traced_bytes"] > 0
@@ -0,0 +1,71 @@
+from notion_query import NotionQuery, any_of_filter, equals_filter
+
+
+class FakeDatabases:
+    def __init__(self) -> None:
+        self.retrieved: list[str] = []
+
+    def retrieve(self, database_id: str) -> dict:
+        self.retrieved.append(database_id)
+        return {"properties": {"Title": {"id": "title"}, "Year": {"id": "%3DyX"}}}
+
+
+class FakeClient:
+    def __init__(self, rows: list[dict], page_size: int = 2) -> None:
+        self.databases = FakeDatabases()
+        self.rows = rows
+        self.page_size = page_size
+        self.calls: list[dict] = []
+
+    def request(self, path, method, query=None, body=None, auth=None) -> dict:
+        self.calls.append({"path": path, "method": method, "query": query, **body})
+        start = int(body.get("start_cursor") or 0)
+        end = start + self.page_size
+        return {
+            "results": self.rows[start:end],
+            "has_more": end < len(self.rows),
+            "next_cursor": str(end) if end < len(self.rows) else None,
+        }
+
+
+def test_rows_paginate_past_the_first_page():
+    client = FakeClient([{"id": str(idx)} for idx in range(5)])
+    query = NotionQuery("db", filter_properties=["Title", "Year", "Gone"])
+
+    rows = [row["id"] for row in query.rows(client)]
+
+    assert rows == ["0", "1", "2", "3", "4"]
+    assert [call.get("start_cursor") for call in client.calls] == [None, "2", "4"]
+    assert all(call["path"] == "databases/db/query" for call in client.calls)
+    # sent as a query parameter by property id, since notion-client drops it
+    assert all(
+        call["query"] == {"filter_properties": ["title", "=yX"]}
+        for call in client.calls
+    )
+    assert client.databases.retrieved == ["db"]
+
+
+def test_where_combines_filters():
+    year = equals_filter("Year", "number", 1)
+    title = equals_filter("Title", "title", "Alpha")
+    query = NotionQuery("db").where(year).where(title)
+
+    assert query.query_body() == {
+        "page_size": 100,
+        "filter": {"and": [year, title]},
+    }
+    assert NotionQuery("db").where(None).query_body().get("filter") is None
+    assert NotionQuery("db").query_params(FakeClient([])) is None
+
+
+def test_rows_where_in_batches_the_values():
+    client = FakeClient([])
+    ids = [str(idx) for idx in range(150)]
+
+    list(NotionQuery("db").rows_where_in(client, "Letterboxd ID", "rich_text", ids))
+
+    filters = [call["filter"] for call in client.calls]
+    assert filters == [
+        any_of_filter("Letterboxd ID", "rich_text", ids[:100]),
+        any_of_filter("Letterboxd ID", "rich_text", ids[100:]),
+    ]
@@ -0,0 +1,135 @@
+import pytest
+
+from assemblers.letterboxd_movie_assembler import NotionMovieItem
+import notion_repository
+from notion_repository import (
+    ExistingMovie,
+    NotionRepo,
+    index_existing_movies,
+    iter_existing_notion_movies,
+)
+
+
+def movie_item(letterboxd_id: str, **overrides) -> NotionMovieItem:
+    fields = {
+        "title": f"Film {letterboxd_id}",
+        "runtime": "1:30",
+        "location": "Netflix",
+        "year": 2022,
+        "letterboxd_id": letterboxd_id,
+        "letterboxd_link": f"https://letterboxd.com/film/{letterboxd_id}/",
+        "poster_url": f"https://a.ltrbxd.com/{letterboxd_id}.jpg",
+        **overrides,
+    }
+    return NotionMovieItem(**fields)
+
+
+def notion_row(item: NotionMovieItem, notion_id: str) -> dict:
+    def text(value: str) -> list[dict]:
+        return [{"plain_text": value}]
+
+    return {
+        "id": notion_id,
+        "properties": {
+            "Title": {"title": text(item.title)},
+            "Year": {"number": item.year},
+            "Runtime": {"rich_text": text(item.runtime)},
+            "Location": {"rich_text": text(item.location)},
+            "Letterboxd ID": {"rich_text": text(item.letterboxd_id)},
+            "Letterboxd Link": {"url": item.letterboxd_link},
+            "Poster": {"files": [{"external": {"url": item.poster_url}}]},
+        },
+    }
+
+
+def test_diff_movie_items_keys_on_letterboxd_id():
+    existing = index_existing_movies(
+        [
+            notion_row(movie_item("1"), "page-1"),
+            notion_row(movie_item("2"), "page-2"),
+            notion_row(movie_item("3"), "page-3"),
+            notion_row(movie_item("3"), "page-3-duplicate"),
+        ]
+    )
+    fresh = [
+        movie_item("1"),
+        movie_item("2", location="Rent $3.99"),
+        movie_item("3"),
+        movie_item("4"),
+    ]
+
+    diff = NotionRepo(fresh).diff_movie_items(existing, fresh)
+
+    assert [item.notion_id for item in diff.delete_list] == ["page-3-duplicate"]
+    assert [item.notion_id for item in diff.do_nothing_list] == ["page-1", "page-3"]
+    assert [item.letterboxd_id for item in diff.add_list] == ["4"]
+    assert len(diff.update_list) == 1
+    update = diff.update_list[0]
+    assert update.notion_id == "page-2"
+    assert update.properties == {
+        "Location": {"rich_text": [{"text": {"content": "Rent $3.99"}}]}
+    }
+
+
+def test_diff_movie_items_deletes_rows_missing_from_the_watchlist():
+    existing = index_existing_movies([notion_row(movie_item("1"), "page-1")])
+
+    diff = NotionRepo([]).diff_movie_items(existing, [])
+
+    assert [item.notion_id for item in diff.delete_list] == ["page-1"]
+    assert not diff.update_list and not diff.add_list
+
+
+def test_index_projects_rows_to_fingerprints():
+    item = movie_item("1")
+
+    index = index_existing_movies([notion_row(item, "page-1")])
+
+    assert index.by_letterboxd_id == {"1": ExistingMovie("page-1", item.fingerprint())}
+    assert not index.duplicates
+
+
+def test_iter_existing_notion_movies_follows_cursors(monkeypatch):
+    pages = {
+        None: {
+            "results": [{"id": "a"}, {"id": "b"}],
+            "has_more": True,
+            "next_cursor": "c1",
+        },
+        "c1": {"results": [{"id": "c"}], "has_more": False, "next_cursor": None},
+    }
+    calls = []
+
+    class FakeDatabases:
+        def retrieve(self, database_id):
+            return {"properties": {"Title": {"id": "title"}}}
+
+    class FakeClient:
+        databases = FakeDatabases()
+
+        def request(self, path, method, query=None, body=None, auth=None):
+            calls.append(body)
+            return pages[body.get("start_cursor")]
+
+    class FakeNotion:
+        client = FakeClient()
+
+    monkeypatch.setattr(notion_repository, "get_notion", FakeNotion)
+
+    rows = iter_existing_notion_movies()
+
+    assert next(rows) == {"id": "a"}
+    # the second page isn't requested until the first is used up
+    assert len(calls) == 1
+    assert [row["id"] for row in rows] == ["b", "c"]
+    assert [call.get("start_cursor") for call in calls] == [None, "c1"]
+
+
+def test_movie_items_compare_on_content_and_are_immutable():
+    item = movie_item("1", notion_id="page-1")
+
+    assert item == movie_item("1")
+    assert hash(item) == hash(movie_item("1"))
+    assert item != movie_item("1", location="Rent $3.99")
+    with pytest.raises(AttributeError):
+        item.location = "Rent $3.99"
@@ -0,0 +1,46 @@
+import json
+
+from notion_schema import (
+    PropertySchema,
+    dumps,
+    encode_external_file,
+    encode_number,
+    encode_title,
+)
+
+SCHEMA = PropertySchema(
+    [
+        ("Title", encode_title),
+        ("Year", encode_number),
+        ("Poster", encode_external_file),
+    ]
+)
+
+
+def test_encode_builds_a_notion_properties_body():
+    assert SCHEMA.encode(("Alpha", 2021, "https://a.ltrbxd.com/alpha.jpg")) == {
+        "Title": {"title": [{"text": {"content": "Alpha"}}]},
+        "Year": {"number": 2021},
+        "Poster": {
+            "files": [
+                {
+                    "name": "https://a.ltrbxd.com/alpha.jpg",
+                    "type": "external",
+                    "external": {"url": "https://a.ltrbxd.com/alpha.jpg"},
+                }
+            ]
+        },
+    }
+    assert SCHEMA.encode(("Alpha", 2021, ""))["Poster"] == {"files": []}
+
+
+def test_encode_columns_only_includes_the_given_columns():
+    values = ("Alpha", 2022, "")
+
+    assert SCHEMA.encode_columns(values, [1]) == {"Year": {"number": 2022}}
+    assert SCHEMA.encode_columns(values, []) == {}
+
+
+def test_dumps_round_trips():
+    body = SCHEMA.encode_all([("Ålpha", 2021, "")])
+    assert json.loads(dumps(body)) == body
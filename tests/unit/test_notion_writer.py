@@ -0,0 +1,89 @@
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import notion_writer
+from notion_writer import NotionWriter, archive_page_op, create_page_op, update_page_op
+
+
+class FakeNotion:
+    def __init__(self) -> None:
+        self.pages: dict[str, dict] = {"page-1": {"properties": {}}}
+        self.calls: list[str] = []
+        self.throttled_once = False
+        self.failed_create_once = False
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/pages", self.create_page)
+        app.router.add_patch("/v1/pages/{page_id}", self.update_page)
+        app.router.add_post("/v1/databases/{database_id}/query", self.query)
+        return app
+
+    async def create_page(self, request: web.Request) -> web.Response:
+        self.calls.append("create")
+        body = await request.json()
+        self.pages[f"page-{len(self.pages) + 1}"] = body
+        if not self.failed_create_once:
+            # the page is saved, but the client never hears about it
+            self.failed_create_once = True
+            return web.Response(status=502)
+        return web.json_response({"object": "page"})
+
+    async def update_page(self, request: web.Request) -> web.Response:
+        self.calls.append("update")
+        page_id = request.match_info["page_id"]
+        if page_id not in self.pages:
+            return web.json_response({"code": "object_not_found"}, status=404)
+        if not self.throttled_once:
+            self.throttled_once = True
+            return web.Response(status=429, headers={"Retry-After": "0.01"})
+        self.pages[page_id].update(await request.json())
+        return web.json_response({"object": "page"})
+
+    async def query(self, request: web.Request) -> web.Response:
+        self.calls.append("query")
+        wanted = (await request.json())["filter"]["rich_text"]["equals"]
+        results = [
+            page
+            for page in self.pages.values()
+            if page.get("properties", {}).get("Letterboxd ID") == wanted
+        ]
+        return web.json_response({"results": results})
+
+
+async def test_writer_retries_throttled_and_ambiguous_writes_without_duplicates(
+    monkeypatch,
+):
+    monkeypatch.setattr(notion_writer, "BASE_BACKOFF_SECONDS", 0.001)
+    fake = FakeNotion()
+    server = TestServer(fake.app())
+    await server.start_server()
+
+    ops = [
+        update_page_op("page-1", {"Location": "Netflix"}),
+        create_page_op(
+            "db",
+            {"Letterboxd ID": "42"},
+            key="42",
+            dedupe_filter={"property": "Letterboxd ID", "rich_text": {"equals": "42"}},
+        ),
+        archive_page_op("missing-page"),
+        archive_page_op("already-archived"),
+    ]
+
+    async with NotionWriter(
+        "token", base_url=str(server.make_url("/v1")), requests_per_second=100
+    ) as writer:
+        acknowledged: list[str] = []
+        report = await writer.run(
+            ops,
+            completed_keys=["archive:already-archived"],
+            on_complete=acknowledged.append,
+        )
+    await server.close()
+
+    assert report.counts == {"succeeded": 2, "retried": 1, "failed": 1, "skipped": 1}
+    assert report.failed_keys == ["archive:missing-page"]
+    assert sorted(acknowledged) == sorted(report.completed_keys)
+    assert fake.calls.count("create") == 1
+    assert fake.pages["page-1"]["properties"] == {"Location": "Netflix"}
@@ -0,0 +1,70 @@
+from assemblers.letterboxd_movie_assembler import NotionMovieItem
+from run_journal import RunJournal
+
+
+def movie_item(letterboxd_id: str) -> NotionMovieItem:
+    return NotionMovieItem(
+        title=f"Film {letterboxd_id}",
+        runtime="1:30",
+        location="Netflix",
+        year=2022,
+        letterboxd_id=letterboxd_id,
+        letterboxd_link=f"https://letterboxd.com/film/{letterboxd_id}/",
+        poster_url=f"https://a.ltrbxd.com/{letterboxd_id}.jpg",
+    )
+
+
+def test_journal_replays_scraped_items_and_acknowledged_writes(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    journal = RunJournal(path)
+    journal.start([movie_item("1"), movie_item("2")])
+    journal.record_write("archive:page-9")
+    journal.record_write("create:1")
+    journal.close()
+
+    resumed = RunJournal(path)
+
+    assert resumed.load()
+    assert resumed.items == [movie_item("1"), movie_item("2")]
+    assert resumed.completed_keys == {"archive:page-9", "create:1"}
+
+
+def test_journal_survives_a_torn_last_line(tmp_path):
+    path = tmp_path / "run.jsonl"
+    journal = RunJournal(str(path))
+    journal.start([movie_item("1")])
+    journal.record_write("create:1")
+    journal.close()
+    with path.open("a") as f:
+        f.write('{"type": "write", "ke')
+
+    resumed = RunJournal(str(path))
+    assert resumed.load()
+    resumed.reopen()
+    resumed.record_write("create:2")
+    resumed.close()
+
+    again = RunJournal(str(path))
+    again.load()
+    assert again.completed_keys == {"create:1", "create:2"}
+
+
+def test_finished_journal_has_nothing_to_resume(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    journal = RunJournal(path)
+    journal.start([movie_item("1")])
+    journal.finish()
+
+    assert not RunJournal(path).load()
+
+
+def test_journal_remembers_a_sampled_run(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    journal = RunJournal(path)
+    journal.start([movie_item("1")], sampled=True)
+    journal.close()
+
+    resumed = RunJournal(path)
+
+    assert resumed.load()
+    assert resumed.sampled
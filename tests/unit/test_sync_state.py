@@ -0,0 +1,60 @@
+import time
+
+from models.letterboxd import WatchOption
+from sync_state import AVAILABILITY_REFRESH, SyncState
+
+
+def test_new_films_need_every_fetch(tmp_path):
+    state = SyncState(str(tmp_path / "state.json"))
+
+    assert state.needs_availability("123")
+    assert state.needs_metadata("123")
+    assert state.fresh_poster_attrs("123") is None
+
+
+def test_recorded_films_round_trip_and_only_stale_fields_refresh(tmp_path):
+    path = str(tmp_path / "state.json")
+    state = SyncState(path)
+    attrs = {"data-film-id": "123", "poster_url": "https://a.ltrbxd.com/x.jpg"}
+    state.record_poster(attrs)
+    state.record_metadata("123", "152", ["Drama"])
+    state.record_availability(
+        "123", WatchOption(name="Netflix", format="hd", type="flatrate", price=None)
+    )
+    state.film("123").availability_fetched_at = (
+        time.time() - AVAILABILITY_REFRESH.total_seconds() - 1
+    )
+    state.save()
+
+    reloaded = SyncState(path)
+
+    assert reloaded.fresh_poster_attrs("123") == attrs
+    assert not reloaded.needs_metadata("123")
+    assert reloaded.needs_availability("123")
+    assert reloaded.film("123").watch_option.name == "Netflix"
+
+
+def test_prune_drops_films_no_longer_on_the_watchlist(tmp_path):
+    state = SyncState(str(tmp_path / "state.json"))
+    state.record_metadata("1", "90", [])
+    state.record_metadata("2", "100", [])
+
+    state.prune(["2"])
+
+    assert list(state.films) == ["2"]
+
+
+def test_unreadable_state_starts_empty(tmp_path):
+    path = tmp_path / "state.json"
+    state = SyncState(str(path))
+    state.record_metadata("1", "90", [])
+    state.save()
+    # what a run killed mid-write used to leave behind
+    path.write_text(path.read_text()[:20])
+
+    reloaded = SyncState(str(path))
+
+    assert reloaded.films == {}
+    assert reloaded.needs_metadata("1")
+    reloaded.save()
+    assert list(tmp_path.iterdir()) == [path]
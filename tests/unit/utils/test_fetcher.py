@@ -0,0 +1,104 @@
+import asyncio
+from datetime import timedelta
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from http_cache import HttpCache
+from utils import Fetcher, read_text
+
+
+async def start_server(handler) -> TestServer:
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+async def test_fetcher_returns_results_in_input_order_and_reports_failures():
+    async def handler(request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        if name == "missing":
+            raise web.HTTPNotFound()
+        # later urls answer first, so ordering can't come from completion order
+        await asyncio.sleep(0.01 * (5 - int(name)))
+        return web.Response(text=name)
+
+    server = await start_server(handler)
+    urls = [str(server.make_url(f"/{name}")) for name in ["1", "missing", "3", "4"]]
+
+    async with Fetcher(concurrency=2, requests_per_second=None) as fetcher:
+        results = await asyncio.gather(*[fetcher.fetch(url, read_text) for url in urls])
+    await server.close()
+
+    assert [result.url for result in results] == urls
+    assert [result.content for result in results] == ["1", None, "3", "4"]
+    assert [result.ok for result in results] == [True, False, True, True]
+
+
+async def test_fetcher_never_exceeds_concurrency_cap():
+    in_flight = 0
+    peak = 0
+
+    async def handler(request: web.Request) -> web.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return web.Response(text="ok")
+
+    server = await start_server(handler)
+    urls = [str(server.make_url(f"/{idx}")) for idx in range(12)]
+
+    async with Fetcher(concurrency=3, requests_per_second=None) as fetcher:
+        results = await asyncio.gather(*[fetcher.fetch(url, read_text) for url in urls])
+    await server.close()
+
+    assert all(result.ok for result in results)
+    assert peak <= 3
+
+
+async def test_fetcher_revalidates_cached_responses_with_etag(tmp_path):
+    requests_seen = []
+
+    async def handler(request: web.Request) -> web.Response:
+        requests_seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.Response(text="body", headers={"ETag": '"v1"'})
+
+    server = await start_server(handler)
+    url = str(server.make_url("/page"))
+    cache = HttpCache(
+        str(tmp_path / "cache.sqlite3"),
+        ttls={"stale": timedelta(0), "fresh": timedelta(days=1)},
+    )
+
+    async with Fetcher(requests_per_second=None, cache=cache) as fetcher:
+        first = await fetcher.fetch(url, read_text, resource="stale")
+        second = await fetcher.fetch(url, read_text, resource="stale")
+        third = await fetcher.fetch(url, read_text, resource="fresh")
+    await server.close()
+    cache.close()
+
+    assert [first.content, second.content, third.content] == ["body"] * 3
+    assert requests_seen == [None, '"v1"']
+    assert cache.stats == {"miss": 1, "revalidated": 1, "hit": 1}
+
+
+def test_cache_prunes_entries_nobody_has_fetched_lately(tmp_path):
+    cache = HttpCache(str(tmp_path / "cache.sqlite3"))
+    cache.store("https://letterboxd.com/film/gone/", b"old")
+    cache.store("https://letterboxd.com/film/kept/", b"new")
+    # last fetched before the retention window
+    cache.connection.execute(
+        "UPDATE responses SET fetched_at = fetched_at - ? WHERE url LIKE '%gone%'",
+        (timedelta(days=90).total_seconds(),),
+    )
+
+    assert cache.prune(timedelta(days=60)) == 1
+    assert cache.get("https://letterboxd.com/film/gone/") is None
+    assert cache.get("https://letterboxd.com/film/kept/").body == b"new"
+    cache.close()